@@ -21,59 +21,134 @@
 # SOFTWARE.
 
 
-"""Usage: swampsat2 [-i] [-l LOGFILE] [-t FILETYPE] [-d DELIMITER] [-f FILE]
-          swampsat2 [-i] [-l LOGFILE] [-t FILETYPE] [-d DELIMITER] [-s HEXSTRING]
+"""Usage: swampsat2 [-i] [-l LOGFILE] [-t FILETYPE] [-d DELIMITER] [--limits=LIMITFILE] [--cache=SIZE] [--checkpoint=MANIFEST] [--compress=CODEC | --sqlite=DBFILE] [--archive=ARCHIVE] [-v] [-f FILE]
+          swampsat2 [-i] [-l LOGFILE] [-t FILETYPE] [-d DELIMITER] [--limits=LIMITFILE] [--cache=SIZE] [--compress=CODEC | --sqlite=DBFILE] [--archive=ARCHIVE] [-v] [-s HEXSTRING]
+          swampsat2 merge [-l LOGFILE] [--compress=CODEC | --sqlite=DBFILE] STREAM...
+          swampsat2 export [-l LOGFILE] [--fields=FIELDS] (--bucket=SECONDS | --points=NUM) LOG
+          swampsat2 passes [-l LOGFILE] [--gap=SECONDS] [--workers=NUM] LOG
+          swampsat2 serve [--host=HOST] [--port=PORT] [--workers=NUM] [--cache=SIZE]
 
-Parse SwampSat II beacons from either a file or command-line string
+Parse SwampSat II beacons from either a file or command-line string, merge parsed data from several stations,
+export downsampled parsed data for trend plots, summarize parsed data by ground station pass,
+or run a local HTTP decode service
+
+Arguments:
+  STREAM                               parsed data (.json, .ss2blk or archive) from one station, given as STATION=FILE or FILE
+  LOG                                  parsed data (.json, .ss2blk or archive) to export or summarize
 
 Options:
-  -f FILE, --file=FILE                 input file containing hex strings from a SwampSat II beacon
+  -f FILE, --file=FILE                 input file (or directory of files) containing hex strings from a SwampSat II beacon
   -s HEXSTRING, --hexstring=HEXSTRING  hex string from a SwampSat II beacon
   -l LOGFILE, --logfile=LOGFILE        file where parsed data will be saved [default: [$HOME]/ss2logs/ss2beacon_parsed_[$TIMESTAMP].json]
-  -t FILETYPE, --filetype=FILETYPE     file type of input file (default behavior is to read the file extension, valid extensions are: '.txt', '.log', '.kss')
+  -t FILETYPE, --filetype=FILETYPE     file type of input file (default behavior is to detect the format from the start of each file, valid extensions are: '.txt', '.log', '.hex', '.kss', '.kiss')
   -i, --image                          flag to read data as jpg image (log name remains the same as default but a .jpg file extension is added)
   -d DELIMITER, --delimiter=DELIMITER  delimiter for input HEX string (whitespace is automatically removed)
+  --limits=LIMITFILE                   JSON file of telemetry limits, violations are saved with each beacon under "alarms"
+  --cache=SIZE                         reuse the decoded beacon for up to SIZE repeated payloads (least recently used are dropped)
+  --checkpoint=MANIFEST                JSON manifest of files already read, unchanged files are skipped and appended files resume where they stopped
+  --compress=CODEC                     save the parsed data as compressed, indexed blocks using the "gzip" or "lzma" codec (a .ss2blk file extension is used)
+  --sqlite=DBFILE                      save the parsed data in a SQLite database (one table per message type) instead of the log file
+  --archive=ARCHIVE                    also save the raw telemetry of each beacon in a compact delta/bit-packed archive
+  --fields=FIELDS                      comma separated fields to export (default is every numeric field)
+  --bucket=SECONDS                     export the min/max/mean/count of each field over fixed time buckets (a .csv file extension is used)
+  --points=NUM                         export each field reduced to NUM points for plotting (a .csv file extension is used)
+  --gap=SECONDS                        time without beacons that separates two passes [default: 600]
+  --workers=NUM                        number of processes summarizing passes or threads decoding requests (default depends on the number of CPUs)
+  --host=HOST                          address the decode service listens on [default: 127.0.0.1]
+  --port=PORT                          port the decode service listens on [default: 8020]
+  -v, --verbose                        print the result of every line read from a file (default is a summary only)
   -h, --help                           prints this help message
   --version                            prints current version
 
 """
 
-from docopt import docopt
+from collections import OrderedDict
+import datetime
+import json
+import os
+import re
+
+
+class DecodeError(ValueError):
+
+    # Reason codes and their messages
+    messages = {
+        'empty': 'String is empty',
+        'invalidchar': 'Invalid character found in string',
+        'length': 'Not a valid SS2 beacon',
+    }
+
+    def __init__(self, reason):
+        self.reason = reason
+        self.message = DecodeError.messages.get(reason, reason)
+        super().__init__(self.message)
 
 
 class ParseDownlink:
 
-    def __init__(self, hexstr='', dlim=''):
-        from _collections import OrderedDict
+    # Message type of each beacon length
+    beaconlens = {163: 3, 185: 4}
 
+    # Byte ranges of each packet (eps: 116, battery: 15, vutrx: 28, ants: 4, stx: 22 bytes) in each message type
+    packetslices = {
+        3: [('eps', slice(0, 116)), ('battery', slice(116, 131)), ('vutrx', slice(131, 159)), ('ants', slice(159, None))],
+        4: [('eps', slice(0, 116)), ('battery', slice(116, 131)), ('vutrx', slice(131, 159)), ('ants', slice(159, 163)),
+            ('stx', slice(163, None))],
+    }
+
+    # Acknowledgement string ("Gator Nation Is Everywhere! From SwampSat II") as hex
+    acknowledgement = ''.join(['47', '61', '74', '6f', '72', '20', '4e', '61',
+                               '74', '69', '6f', '6e', '20', '49', '73', '20',
+                               '45', '76', '65', '72', '79', '77', '68', '65',
+                               '72', '65', '21', '20', '46', '72', '6f', '6d',
+                               '20', '53', '77', '61', '6d', '70', '53', '61',
+                               '74', '20', '49', '49'])
+
+    # Characters accepted by hextofloat and hextodouble (lower case only, like string.hexdigits.lower())
+    hexdigits = frozenset('0123456789abcdef')
+
+    def __init__(self, hexstr='', dlim='', limits=None, cache=None):
         self._errmsg = ''
+        self.error = None
+        self.raw = b''
         self.compileddata = OrderedDict()
-        self._parse(hexstr, dlim)
+        self._parse(hexstr, dlim, cache)
+
+        # Evaluate the compiled limits against the decoded beacon
+        if limits is not None and len(self.compileddata) > 0:
+            self.compileddata['alarms'] = limits.check(self.compileddata)
 
     @classmethod
-    def parse(cls, hexstr='', dlim=''):
-        obj = cls(hexstr, dlim)
+    def parse(cls, hexstr='', dlim='', limits=None, cache=None, stats=None):
+        obj = cls(hexstr, dlim, limits, cache)
+        if stats is not None:
+            stats.add(obj.error)
         return obj.compileddata
 
     @classmethod
-    def parserecord(cls, hexstr='', logpath='[$HOME]/ss2logs/ss2beacon_parsed_[$TIMESTAMP].json', dlim=''):
-        obj = cls(hexstr, dlim)
+    def decode(cls, hexstr='', dlim='', limits=None, cache=None):
+        obj = cls(hexstr, dlim, limits, cache)
+        if obj.error is not None:
+            raise obj.error
+        return obj.compileddata
+
+    @classmethod
+    def parserecord(cls, hexstr='', logpath='[$HOME]/ss2logs/ss2beacon_parsed_[$TIMESTAMP].json', dlim='', limits=None,
+                    cache=None, stats=None):
+        obj = cls(hexstr, dlim, limits, cache)
+        if stats is not None:
+            stats.add(obj.error)
         if obj._errmsg == '':
             obj.record(logpath)
         return obj.compileddata
 
     def display(self):
-        import json
         print(json.dumps(self.compileddata, indent=4))
 
     def get(self):
         return self.compileddata
 
     def record(self, logpath='[$HOME]/ss2logs/ss2beacon_parsed_[$TIMESTAMP].json'):
-        import json
-        import datetime
-        import os
-
         # Replace the $HOME placeholder with the OS/user corrected home folder
         logpath = logpath.replace(os.path.normcase('[$HOME]'), os.path.expanduser('~'))
 
@@ -91,30 +166,32 @@ class ParseDownlink:
             json.dump(self.compileddata, lfile, indent=4)
             lfile.write('\n')
 
-    def _parse(self, hexstr, dlim=''):
-        from collections import OrderedDict
-        import datetime
-
-        # Expected packet lengths
-        packetlens = {'eps': 116, 'battery': 15, 'vutrx': 28, 'ants': 4, 'stx': 22}
+    def _parse(self, hexstr, dlim='', cache=None):
 
         # Get timestamp
-        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S ') + datetime.datetime.now().astimezone().tzname()
+        now = datetime.datetime.now()
+        timestamp = now.strftime('%Y-%m-%d %H:%M:%S ') + now.astimezone().tzname()
+
+        # Reuse the decoded beacon if this exact payload was already seen, only the timestamp changes
+        if cache is not None:
+            cachekey = ParseDownlink._normalize(hexstr, dlim)
+            cached = cache.get(cachekey)
+            if cached is not None:
+                self.compileddata = OrderedDict(cached)
+                self.compileddata['timestamp'] = timestamp
+                if len(cachekey) % 2 == 0:
+                    self.raw = bytes.fromhex(cachekey)
+                return self.compileddata
 
         # Clean input
-        hexstr_cleaned, errmsg = ParseDownlink._cleaninput(hexstr, dlim)
+        hexstr_cleaned, reason = ParseDownlink._cleaninput(hexstr, dlim)
         length = len(hexstr_cleaned)
         if length == 0:
 
-            self._errmsg = errmsg
+            self.error = DecodeError(reason)
 
         # Check if the downlink is contains the acknowledgement
-        elif ''.join(['47', '61', '74', '6f', '72', '20', '4e', '61',
-                      '74', '69', '6f', '6e', '20', '49', '73', '20',
-                      '45', '76', '65', '72', '79', '77', '68', '65',
-                      '72', '65', '21', '20', '46', '72', '6f', '6d',
-                      '20', '53', '77', '61', '6d', '70', '53', '61',
-                      '74', '20', '49', '49']) in ''.join(hexstr_cleaned):
+        elif ParseDownlink.acknowledgement in ''.join(hexstr_cleaned):
 
             self.compileddata = OrderedDict()
             self.compileddata['timestamp'] = timestamp
@@ -123,121 +200,59 @@ class ParseDownlink:
             self.compileddata['messagetotal'] = 1
             self.compileddata['message'] = 'Gator Nation Is Everywhere! From SwampSat II'
 
-        # Flight mode 1 second beacon
-        elif length == 163:
-
-            # Separate data packets
-            epslist = hexstr_cleaned[:packetlens['eps']]
-
-            batterylist = hexstr_cleaned[
-                          packetlens['eps']:
-                          packetlens['eps'] +
-                          packetlens['battery']
-                          ]
-
-            vutrxlist = hexstr_cleaned[
-                        packetlens['eps'] +
-                        packetlens['battery']:
-                        packetlens['eps'] +
-                        packetlens['battery'] +
-                        packetlens['vutrx']
-                        ]
+        # Flight mode 1 (163 bytes) or flight mode 2 (185 bytes) second beacon
+        elif length in ParseDownlink.beaconlens:
 
-            antslist = hexstr_cleaned[packetlens['eps'] + packetlens['battery'] + packetlens['vutrx']:]
-
-            epsdata = self._eps(epslist)
-            batterydata = self._battery(batterylist)
-            vutrxdata = self._vutrx(vutrxlist)
-            antsdata = self._ants(antslist)
+            msgtype = ParseDownlink.beaconlens[length]
 
             self.compileddata = OrderedDict()
             self.compileddata['timestamp'] = timestamp
-            self.compileddata['msgtype'] = 3
+            self.compileddata['msgtype'] = msgtype
             self.compileddata['messagenum'] = 2
             self.compileddata['messagetotal'] = 2
-            self.compileddata.update(epsdata)
-            self.compileddata.update(batterydata)
-            self.compileddata.update(vutrxdata)
-            self.compileddata.update(antsdata)
-
-        # Flight mode 2 second beacon
-        elif length == 185:
-
-            # Separate data packets
-            epslist = hexstr_cleaned[:packetlens['eps']]
-
-            batterylist = hexstr_cleaned[
-                          packetlens['eps']:
-                          packetlens['eps'] +
-                          packetlens['battery']
-                          ]
-
-            vutrxlist = hexstr_cleaned[
-                        packetlens['eps'] +
-                        packetlens['battery']:
-                        packetlens['eps'] +
-                        packetlens['battery'] +
-                        packetlens['vutrx']
-                        ]
-
-            antslist = hexstr_cleaned[
-                       packetlens['eps'] +
-                       packetlens['battery'] +
-                       packetlens['vutrx']:
-                       packetlens['eps'] +
-                       packetlens['battery'] +
-                       packetlens['vutrx'] +
-                       packetlens['ants']
-                       ]
-
-            stxlist = hexstr_cleaned[
-                      packetlens['eps'] +
-                      packetlens['battery'] +
-                      packetlens['vutrx'] +
-                      packetlens['ants']:
-                      ]
-
-            epsdata = self._eps(epslist)
-            batterydata = self._battery(batterylist)
-            vutrxdata = self._vutrx(vutrxlist)
-            antsdata = self._ants(antslist)
-            stxdata = self._stx(stxlist)
 
-            self.compileddata = OrderedDict()
-            self.compileddata['timestamp'] = timestamp
-            self.compileddata['msgtype'] = 4
-            self.compileddata['messagenum'] = 2
-            self.compileddata['messagetotal'] = 2
-            self.compileddata.update(epsdata)
-            self.compileddata.update(batterydata)
-            self.compileddata.update(vutrxdata)
-            self.compileddata.update(antsdata)
-            self.compileddata.update(stxdata)
+            # Separate data packets and decode each one
+            for packet, span in ParseDownlink.packetslices[msgtype]:
+                self.compileddata.update(getattr(self, '_' + packet)(hexstr_cleaned[span]))
 
         else:
 
-            self._errmsg = '\t\t  Not a valid SS2 beacon'
+            self.error = DecodeError('length')
 
-        if self._errmsg != '':
+        if self.error is not None:
 
-            print(self._errmsg)
+            # Kept in its old printable form for existing callers
+            self._errmsg = '\t\t  ' + self.error.message
             self.compileddata = OrderedDict()
 
+        else:
+
+            # Cleaned payload bytes (e.g. for the archive), a payload ending in half a byte has none
+            if len(hexstr_cleaned[-1]) == 2:
+                self.raw = bytes.fromhex(''.join(hexstr_cleaned))
+
+            if cache is not None:
+                cache.put(cachekey, OrderedDict(self.compileddata))
+
         return self.compileddata
 
+    @staticmethod
+    def _normalize(hstr, dlim):
+        return hstr.lower().strip().replace(' ', '').replace(dlim, '').replace('\t', '').replace('\r', '').replace('\n', '')
+
     @staticmethod
     def _cleaninput(hstr, dlim):
 
         # Clean input
-        hstr_cleaned = hstr.lower().strip().replace(' ', '').replace(dlim, '').replace('\t', '').replace('\r', '').replace('\n', '')
+        hstr_cleaned = ParseDownlink._normalize(hstr, dlim)
 
         # Check length
         if len(hstr_cleaned) == 0:
-            return [], '\t\t  String is empty'
+            return [], 'empty'
 
         # Check if the string contains anything except for hex values and the delimiter
         if ParseDownlink._validatehex(hstr_cleaned, dlim):
-            return [], '\t\t  Invalid character found in string'
+            return [], 'invalidchar'
 
         # Split hex string into list of bytes
         return [hstr_cleaned[i:i + 2] for i in range(0, len(hstr_cleaned), 2)], ''
@@ -343,8 +358,6 @@ class ParseDownlink:
 
     @staticmethod
     def _eps(hexarray):
-        from collections import OrderedDict
-
         ordict = OrderedDict()
         ordict['eps_output_current_bcr'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 14.662757
         ordict['eps_output_voltage_bcr'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 0.008993157
@@ -420,8 +433,6 @@ class ParseDownlink:
 
     @staticmethod
     def _battery(hexarray):
-        from collections import OrderedDict
-
         ordict = OrderedDict()
         ordict['battery_voltage'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 0.008993
         ordict['battery_current'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 14.662757 / 1000
@@ -441,25 +452,24 @@ class ParseDownlink:
         return ordict
 
     @staticmethod
-    def _vutrx(hexarray):
-        from collections import OrderedDict
-
-        def getkbits8(num, k, p):
-            binary = bin(num)[2:]  # convert number into binary first
-            leadingzeros = 8 - len(binary)  # Count the necessary leading zeros to fill byte
-            binary = '0' * leadingzeros + binary  # Fill byte with leading zeros
-            end = 8 - p - 1
-            start = end - k + 1
-            k_bit_sub_str = binary[start: end + 1]  # extract k  bit sub-string
-            return int(k_bit_sub_str, 2)  # convert extracted sub-string into decimal again
+    def _getkbits8(num, k, p):
+        binary = bin(num)[2:]  # convert number into binary first
+        leadingzeros = 8 - len(binary)  # Count the necessary leading zeros to fill byte
+        binary = '0' * leadingzeros + binary  # Fill byte with leading zeros
+        end = 8 - p - 1
+        start = end - k + 1
+        k_bit_sub_str = binary[start: end + 1]  # extract k  bit sub-string
+        return int(k_bit_sub_str, 2)  # convert extracted sub-string into decimal again
 
+    @staticmethod
+    def _vutrx(hexarray):
         ordict = OrderedDict()
         ordict['vutrx_rx_failedpackage'] = ParseDownlink._parsebinary(hexarray, 'uint8')
         ordict['vutrx_rx_crcfailedpackage'] = ParseDownlink._parsebinary(hexarray, 'uint16')
         ordict['vutrx_rx_packagecounter'] = ParseDownlink._parsebinary(hexarray, 'uint16')
         frequentlock = ParseDownlink._parsebinary(hexarray, 'uint8')  # Get whole register
-        ordict['vutrx_rx_frequentlock'] = getkbits8(frequentlock, 1, 0)  # Split register by bit position
-        ordict['vutrx_tx_frequentlock'] = getkbits8(frequentlock, 1, 1)
+        ordict['vutrx_rx_frequentlock'] = ParseDownlink._getkbits8(frequentlock, 1, 0)  # Split register by bit position
+        ordict['vutrx_tx_frequentlock'] = ParseDownlink._getkbits8(frequentlock, 1, 1)
         ordict['vutrx_rssi'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 3 / 4096
         ordict['vutrx_smps_temperature'] = ParseDownlink._parsebinary(hexarray, 'int8')
         ordict['vutrx_poweramplifier_temperature'] = ParseDownlink._parsebinary(hexarray, 'int8')
@@ -467,8 +477,8 @@ class ParseDownlink:
         ordict['vutrx_frequencyoffset_tx'] = ParseDownlink._parsebinary(hexarray, 'uint16')
         ordict['vutrx_frequencyoffset_rx'] = ParseDownlink._parsebinary(hexarray, 'uint16')
         dtmf = ParseDownlink._parsebinary(hexarray, 'uint8')  # Get whole register
-        ordict['vutrx_dtmf_tone'] = getkbits8(dtmf, 4, 0)  # Split register by bit position
-        ordict['vutrx_dtmf_counter'] = getkbits8(dtmf, 4, 4)
+        ordict['vutrx_dtmf_tone'] = ParseDownlink._getkbits8(dtmf, 4, 0)  # Split register by bit position
+        ordict['vutrx_dtmf_counter'] = ParseDownlink._getkbits8(dtmf, 4, 4)
         ordict['vutrx_current_3v3'] = ParseDownlink._parsebinary(hexarray, 'int16') * 3e-6
         ordict['vutrx_current_5v'] = ParseDownlink._parsebinary(hexarray, 'int16') * 62e-6
         ordict['vutrx_voltage_3v3'] = ParseDownlink._parsebinary(hexarray, 'int16') * 4e-3
@@ -480,24 +490,13 @@ class ParseDownlink:
 
     @staticmethod
     def _stx(hexarray):
-        from collections import OrderedDict
-
-        def getkbits8(num, k, p):
-            binary = bin(num)[2:]  # convert number into binary first
-            leadingzeros = 8 - len(binary)  # Count the necessary leading zeros to fill byte
-            binary = '0' * leadingzeros + binary  # Fill byte with leading zeros
-            end = 8 - p - 1
-            start = end - k + 1
-            k_bit_sub_str = binary[start: end + 1]  # extract k  bit sub-string
-            return int(k_bit_sub_str, 2)  # convert extracted sub-string into decimal again
-
         ordict = OrderedDict()
         ordict['stx_voltage_battery'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 4e-3
         ordict['stx_current_battery'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 40e-6
         ordict['stx_voltage_poweramplifier'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 4e-3
         ordict['stx_current_poweramplifier'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 40e-6
-        ordict['stx_temperature_top'] = getkbits8(ParseDownlink._parsebinary(hexarray, 'int16'), 12, 4) * 0.0625
-        ordict['stx_temperature_bottom'] = getkbits8(ParseDownlink._parsebinary(hexarray, 'int16'), 12, 4) * 0.0625
+        ordict['stx_temperature_top'] = ParseDownlink._getkbits8(ParseDownlink._parsebinary(hexarray, 'int16'), 12, 4) * 0.0625
+        ordict['stx_temperature_bottom'] = ParseDownlink._getkbits8(ParseDownlink._parsebinary(hexarray, 'int16'), 12, 4) * 0.0625
         ordict['stx_temperature_poweramplifier'] = \
             ((ParseDownlink._parsebinary(hexarray, 'uint8') * 3 / 4096) - 0.5) * 100
         ordict['stx_synth_offset'] = ParseDownlink._parsebinary(hexarray, 'uint8') * 0.5 + 2400
@@ -515,8 +514,6 @@ class ParseDownlink:
 
     @staticmethod
     def _ants(hexarray):
-        from collections import OrderedDict
-
         ordict = OrderedDict()
         ordict['ants_temperature'] = ParseDownlink._parsebinary(hexarray, 'uint16') * 3.3 / 1023
 
@@ -542,12 +539,11 @@ class ParseDownlink:
 
     @staticmethod
     def hextofloat(h, swap=False):
-        import string
         if not isinstance(h, str):
             raise TypeError
         if not h.startswith('0x'):
             h = '0x' + h
-        if not all(c in string.hexdigits.lower() for c in h[2:]):
+        if not all(c in ParseDownlink.hexdigits for c in h[2:]):
             raise ValueError
         if swap:
             h = '0x' + ''.join(reversed([h[2:][i:i + 2] for i in range(0, len(h[2:]), 2)]))
@@ -568,12 +564,11 @@ class ParseDownlink:
 
     @staticmethod
     def hextodouble(h, swap=False):
-        import string
         if not isinstance(h, str):
             raise TypeError
         if not h.startswith('0x'):
             h = '0x' + h
-        if not all(c in string.hexdigits.lower() for c in h[2:]):
+        if not all(c in ParseDownlink.hexdigits for c in h[2:]):
             raise ValueError
         if swap:
             h = '0x' + ''.join(reversed([h[2:][i:i + 2] for i in range(0, len(h[2:]), 2)]))
@@ -593,62 +588,611 @@ class ParseDownlink:
         return sign * 2 ** (exponent - 1023) * mval
 
 
-def _readkss(fpath):
-    import re
-    import os
+class DecodeCache:
 
-    # Normalize path
-    fpath = os.path.normcase(fpath)
+    def __init__(self, size=256):
+        import threading
 
-    # Read file contents
-    with open(fpath, 'rb') as r:
-        contents = r.read()
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
 
-    # Split lines
-    rawlines = contents.splitlines()
-    datalines = []
-    packet = ''
+    def __len__(self):
+        return len(self._entries)
 
-    # Callsign
-    callsigns = 'AEA468AA8C40E0AE9664B092886103F0'.lower()
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries[key]
+            except KeyError:
+                self.misses += 1
+                return None
 
-    # Possible prefix and suffix
-    linewrappers = {'prefix': 'c000', 'suffix': 'c0'}
+            # Mark as most recently used
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+
+            # Evict the least recently used entries
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+class DecodeStats:
+
+    def __init__(self):
+        from collections import Counter
+        import threading
+
+        self.decoded = 0
+        self.errors = Counter()
+        self._lock = threading.Lock()
+
+    def __str__(self):
+        summary = str(self.decoded) + ' decoded, ' + str(sum(self.errors.values())) + ' skipped'
+        if len(self.errors) > 0:
+            summary += ' (' + ', '.join(reason + ': ' + str(count) for reason, count in sorted(self.errors.items())) + ')'
+        return summary
+
+    def add(self, error=None):
+        with self._lock:
+            if error is None:
+                self.decoded += 1
+            else:
+                self.errors[error.reason] += 1
+
+
+def _beaconfields(msgtype=4):
+    # Decode an all-zero beacon of the requested type to list its fields (and the python type of each value)
+    beaconlens = {3: 163, 4: 185}
+    decoded = ParseDownlink.parse('00' * beaconlens[msgtype])
+    return OrderedDict((key, type(value)) for key, value in decoded.items())
+
+
+class LimitChecker:
+
+    def __init__(self, limits):
+
+        from fnmatch import fnmatchcase
+
+        if not isinstance(limits, dict):
+            raise ValueError('Limits must be an object keyed by beacon field name')
+
+        # Catch misspelled fields and malformed rules, every beacon field exists in the type 4 beacon
+        fieldnames = list(_beaconfields(4))
+        for pattern in limits:
+            LimitChecker._validate(pattern, limits[pattern])
+            if not any(fnmatchcase(field, pattern) for field in fieldnames):
+                raise ValueError('Limit field "%s" does not match any beacon field' % pattern)
+
+        # Last value seen for each field with a rate-of-change rule
+        self._previous = {}
+
+        # Compile the limits once per beacon type so the check only touches fields that exist in the record
+        self._compiled = {msgtype: LimitChecker._compile(limits, list(_beaconfields(msgtype))) for msgtype in (3, 4)}
+
+    @classmethod
+    def load(cls, fpath):
+        with open(os.path.normcase(fpath), 'rt', encoding='utf-8') as r:
+            return cls(json.load(r))
+
+    def check(self, record):
+        events = []
+
+        # Only the telemetry beacons carry limit checked values
+        compiled = self._compiled.get(record.get('msgtype'))
+        if compiled is None:
+            return events
+
+        # Red/yellow thresholds
+        fields, getter, bounds = compiled['range']
+        if getter is not None:
+            for field, value, (redlo, redhi, yellowlo, yellowhi) in zip(fields, getter(record), bounds):
+                if not yellowlo <= value <= yellowhi:
+                    if not redlo <= value <= redhi:
+                        level, limit = 'red', [redlo, redhi]
+                    else:
+                        level, limit = 'yellow', [yellowlo, yellowhi]
+                    events.append(OrderedDict([('field', field), ('rule', 'range'), ('level', level),
+                                               ('value', value), ('limit', LimitChecker._jsonlimit(limit))]))
+
+        # Rate-of-change between consecutive beacons
+        fields, getter, bounds = compiled['delta']
+        if getter is not None:
+            previous = self._previous
+            for field, value, (reddelta, yellowdelta) in zip(fields, getter(record), bounds):
+                last = previous.get(field)
+                previous[field] = value
+                if last is None:
+                    continue
+                delta = value - last
+                if abs(delta) > yellowdelta:
+                    if abs(delta) > reddelta:
+                        level, limit = 'red', reddelta
+                    else:
+                        level, limit = 'yellow', yellowdelta
+                    events.append(OrderedDict([('field', field), ('rule', 'delta'), ('level', level),
+                                               ('value', delta), ('limit', limit)]))
+
+        # Bit flag expectations (compare all flags at once and only look closer when something differs)
+        fields, getter, expected = compiled['flag']
+        if getter is not None:
+            values = getter(record)
+            if values != expected[0]:
+                for field, value, want, level in zip(fields, values, expected[0], expected[1]):
+                    if value != want:
+                        events.append(OrderedDict([('field', field), ('rule', 'flag'), ('level', level),
+                                                   ('value', value), ('limit', want)]))
+
+        return events
+
+    @staticmethod
+    def _compile(limits, fieldnames):
+        from fnmatch import fnmatchcase
+
+        inf = float('inf')
+        ranges, deltas, flags = [], [], []
+        for pattern, rules in limits.items():
+
+            # Field names can be given as shell-style patterns (e.g. "eps_temperature_*")
+            matches = [field for field in fieldnames if fnmatchcase(field, pattern)]
+
+            for field in matches:
+
+                if 'red' in rules or 'yellow' in rules:
+                    redlo, redhi = LimitChecker._bounds(rules.get('red'), -inf, inf)
+                    yellowlo, yellowhi = LimitChecker._bounds(rules.get('yellow'), redlo, redhi)
+                    ranges.append((field, (redlo, redhi, max(yellowlo, redlo), min(yellowhi, redhi))))
+
+                if 'delta' in rules:
+                    delta = rules['delta']
+                    if not isinstance(delta, dict):
+                        delta = {'red': delta}
+                    reddelta = inf if delta.get('red') is None else delta['red']
+                    yellowdelta = reddelta if delta.get('yellow') is None else min(delta['yellow'], reddelta)
+                    deltas.append((field, (reddelta, yellowdelta)))
+
+                if 'expect' in rules:
+                    flags.append((field, (int(rules['expect']), rules.get('level', 'red'))))
+
+        # Later entries override earlier ones for the same field (e.g. a pattern followed by a specific field)
+        ranges, deltas, flags = [list(dict(rules).items()) for rules in (ranges, deltas, flags)]
+
+        compiled = {
+            'range': (tuple(f for f, _ in ranges), LimitChecker._getter([f for f, _ in ranges]), tuple(b for _, b in ranges)),
+            'delta': (tuple(f for f, _ in deltas), LimitChecker._getter([f for f, _ in deltas]), tuple(b for _, b in deltas)),
+            'flag': (tuple(f for f, _ in flags), LimitChecker._getter([f for f, _ in flags]),
+                     (tuple(e for _, (e, _) in flags), tuple(lvl for _, (_, lvl) in flags))),
+        }
+        return compiled
+
+    @staticmethod
+    def _validate(pattern, rules):
+
+        # Rules are an object of known rule names
+        if not isinstance(rules, dict) or len(rules) == 0:
+            raise ValueError('Limit rules for "%s" must be a non-empty object' % pattern)
+        unknown = set(rules) - {'red', 'yellow', 'delta', 'expect', 'level'}
+        if len(unknown) > 0:
+            raise ValueError('Unknown limit rule(s) for "%s": %s' % (pattern, ', '.join(sorted(unknown))))
+        if not {'red', 'yellow', 'delta', 'expect'} & set(rules):
+            raise ValueError('No red, yellow, delta or expect rule for "%s"' % pattern)
+
+        def isnumber(value):
+            return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+        # Thresholds are [LOW, HIGH] pairs (null for an open bound)
+        for name in ('red', 'yellow'):
+            if name in rules:
+                pair = rules[name]
+                if not isinstance(pair, list) or len(pair) != 2 or not all(bound is None or isnumber(bound) for bound in pair):
+                    raise ValueError('Limit rule "%s" for "%s" must be [LOW, HIGH], got %s' % (name, pattern, json.dumps(pair)))
+                if None not in pair and pair[0] > pair[1]:
+                    raise ValueError('Limit rule "%s" for "%s" has LOW above HIGH: %s' % (name, pattern, json.dumps(pair)))
+
+        # The yellow band lies inside the red band
+        if 'red' in rules and 'yellow' in rules:
+            (redlo, redhi), (yellowlo, yellowhi) = rules['red'], rules['yellow']
+            if (yellowlo is not None and redlo is not None and yellowlo < redlo) or \
+                    (yellowhi is not None and redhi is not None and yellowhi > redhi):
+                raise ValueError('Limit rule "yellow" for "%s" must be inside "red": %s is outside %s' % (
+                    pattern, json.dumps(rules['yellow']), json.dumps(rules['red'])))
+
+        # Rate-of-change limits are a number or {"red": MAX, "yellow": MAX}
+        if 'delta' in rules:
+            delta = rules['delta']
+            if isinstance(delta, dict):
+                if len(delta) == 0 or set(delta) - {'red', 'yellow'} or \
+                        not all(value is None or (isnumber(value) and value >= 0) for value in delta.values()):
+                    raise ValueError('Limit rule "delta" for "%s" must be {"red": MAX, "yellow": MAX}, got %s' % (pattern, json.dumps(delta)))
+                if delta.get('red') is not None and delta.get('yellow') is not None and delta['yellow'] > delta['red']:
+                    raise ValueError('Limit rule "delta" for "%s" has a yellow limit above the red limit: %s' % (pattern, json.dumps(delta)))
+            elif not isnumber(delta) or delta < 0:
+                raise ValueError('Limit rule "delta" for "%s" must be a non-negative number, got %s' % (pattern, json.dumps(delta)))
+
+        # Bit flags are expected to be 0 or 1
+        if 'expect' in rules and rules['expect'] not in (0, 1):
+            raise ValueError('Limit rule "expect" for "%s" must be 0 or 1, got %s' % (pattern, json.dumps(rules['expect'])))
+        if 'level' in rules and 'expect' not in rules:
+            raise ValueError('Limit rule "level" for "%s" only applies to an "expect" rule' % pattern)
+        if rules.get('level', 'red') not in ('red', 'yellow'):
+            raise ValueError('Limit rule "level" for "%s" must be "red" or "yellow", got %s' % (pattern, json.dumps(rules['level'])))
+
+    @staticmethod
+    def _getter(fields):
+        from operator import itemgetter
+
+        # Always return a tuple of values, even for a single field
+        if len(fields) == 0:
+            return None
+        elif len(fields) == 1:
+            field = fields[0]
+            return lambda record: (record[field],)
+        return itemgetter(*fields)
+
+    @staticmethod
+    def _bounds(pair, lo, hi):
+        if pair is None:
+            return lo, hi
+        return (lo if pair[0] is None else pair[0]), (hi if pair[1] is None else pair[1])
+
+    @staticmethod
+    def _jsonlimit(limit):
+
+        # Infinite bounds are written as null to keep the log valid JSON
+        return [None if abs(bound) == float('inf') else bound for bound in limit]
 
-    for line in rawlines:
 
-        # Try to decode the line using utf-8 character set
+class Checkpoint:
+
+    def __init__(self, path):
+        # Replace the $HOME placeholder with the OS/user corrected home folder
+        self.path = os.path.normcase(path).replace(os.path.normcase('[$HOME]'), os.path.expanduser('~'))
+        self._stats = {}
+        self._settled = set()
+
+        # Load the manifest of previously read files
+        try:
+            with open(self.path, 'rt', encoding='utf-8') as r:
+                self.files = json.load(r)
+        except (OSError, ValueError):
+            self.files = {}
+
+    def resume(self, fpath):
+        key = os.path.abspath(os.path.normcase(fpath))
+        stat = os.stat(key)
+
+        # Keep the file size/time from before the read, so data appended while reading is picked up next time
+        self._stats[key] = stat
+
+        entry = self.files.get(key)
+        if entry is None:
+            return 0
+
+        # Unchanged files are skipped once they were read to the end
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            if entry['offset'] >= stat.st_size:
+                return None
+
+            # The file stopped growing, so a last line without a line break is complete and can be read now
+            self._settled.add(key)
+            return entry['offset']
+
+        # Resume after the last fully read packet, unless the file was truncated or replaced
+        if stat.st_size < entry['offset'] or Checkpoint._fingerprint(key, entry['offset']) != entry['fingerprint']:
+            return 0
+        return entry['offset']
+
+    def settled(self, fpath):
+        return os.path.abspath(os.path.normcase(fpath)) in self._settled
+
+    def update(self, fpath, offset):
+        key = os.path.abspath(os.path.normcase(fpath))
+        stat = self._stats.pop(key, None) or os.stat(key)
+        self.files[key] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'offset': offset,
+                           'fingerprint': Checkpoint._fingerprint(key, offset)}
+
+    def save(self):
         try:
-            line = line.decode('utf-8')
+            os.makedirs(os.path.split(self.path)[0], exist_ok=True)
+        except OSError:
+            pass
 
-        # Catch invalid utf-8 encodings, we can't do anything with these
-        except UnicodeDecodeError:
+        # Write to a temporary file first so an interrupted run never leaves a broken manifest
+        with open(self.path + '.tmp', 'wt', encoding='utf-8') as w:
+            json.dump(self.files, w, indent=4)
+        os.replace(self.path + '.tmp', self.path)
+
+    @staticmethod
+    def _fingerprint(fpath, offset, blocksize=4096):
+        import hashlib
+
+        # Hash the start of the file and the bytes just before the offset, enough to notice a rewritten file
+        digest = hashlib.sha1()
+        with open(fpath, 'rb') as r:
+            digest.update(r.read(min(blocksize, offset)))
+            r.seek(max(0, offset - blocksize))
+            digest.update(r.read(min(blocksize, offset)))
+        return digest.hexdigest()
+
+
+def _scanjson(r, offset=0):
+
+    # Records are written with json.dump(..., indent=4), so every top level object starts with a "{" line and
+    # ends with a "}" line, anything nested is indented
+    r.seek(offset)
+    position = offset
+    start = None
+    lines = []
+    for line in r:
+        stripped = line.rstrip(b'\r\n')
+        if start is None:
+            if stripped == b'{':
+                start = position
+                lines = [line]
+            elif stripped == b'{}':
+                yield position, position + len(line), line
+        else:
+            lines.append(line)
+            if stripped == b'}':
+                yield start, position + len(line), b''.join(lines)
+                start = None
+        position += len(line)
 
-            # If data was being collected
-            if packet != '':
 
-                # Append that packet to the file's list
-                datalines += [packet]
+class LogReader:
 
-            # Reset packet string
-            packet = ''
+    def __init__(self, path, indexpath=None):
+        self.path = os.path.normcase(path)
+        self.indexpath = self.path + '.idx' if indexpath is None else os.path.normcase(indexpath)
 
-        # If there were no problems decoding
+        # Load the sidecar index of a previous scan
+        try:
+            with open(self.indexpath, 'rt', encoding='utf-8') as r:
+                index = json.load(r)
+        except (OSError, ValueError):
+            index = {}
+        self.scanned = index.get('scanned', 0)
+        self.fingerprint = index.get('fingerprint', '')
+        self.index = index.get('records', [])
+
+        # Timestamp column for range queries, kept up to date as the log grows
+        self._timestamps = [timestamp for _, _, timestamp, _ in self.index]
+        self._ordered = all(a <= b for a, b in zip(self._timestamps, self._timestamps[1:]))
+
+        self.refresh()
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        # Seek straight to the record
+        start, length, _, _ = self.index[i]
+        with open(self.path, 'rb') as r:
+            r.seek(start)
+            return json.loads(r.read(length).decode('utf-8'), object_pairs_hook=OrderedDict)
+
+    def refresh(self):
+        size = os.path.getsize(self.path)
+
+        # Start over if the log was truncated or replaced since the last scan
+        if size < self.scanned or Checkpoint._fingerprint(self.path, self.scanned) != self.fingerprint:
+            self.scanned = 0
+            self.index = []
+            self._timestamps = []
+            self._ordered = True
+
+        if size == self.scanned:
+            return
+
+        # Only scan the data appended since the last scan
+        with open(self.path, 'rb') as r:
+            for start, end, text in _scanjson(r, self.scanned):
+                record = json.loads(text.decode('utf-8'), object_pairs_hook=OrderedDict)
+                timestamp = record.get('timestamp', '')
+                if len(self._timestamps) > 0 and timestamp < self._timestamps[-1]:
+                    self._ordered = False
+                self.index.append([start, end - start, timestamp, record.get('msgtype')])
+                self._timestamps.append(timestamp)
+                self.scanned = end
+
+        self.fingerprint = Checkpoint._fingerprint(self.path, self.scanned)
+        self._save()
+
+    def records(self, start=None, end=None, msgtype=None):
+        from bisect import bisect_left, bisect_right
+
+        # Timestamps are in order for logs written by the parser, otherwise every entry is checked
+        timestamps = self._timestamps
+        if self._ordered:
+            first = 0 if start is None else bisect_left(timestamps, start)
+            last = len(timestamps) if end is None else bisect_right(timestamps, end + '\uffff')
         else:
+            first, last = 0, len(timestamps)
+
+        # Seek to each matching record in one open file
+        with open(self.path, 'rb') as r:
+            for i in range(first, last):
+                offset, length, timestamp, mtype = self.index[i]
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp[:len(end)] > end:
+                    continue
+                if msgtype is not None and mtype != msgtype:
+                    continue
+                r.seek(offset)
+                yield json.loads(r.read(length).decode('utf-8'), object_pairs_hook=OrderedDict)
+
+    def _save(self):
+        # The index is only a cache, a log in a read-only folder is still readable
+        try:
+            with open(self.indexpath, 'wt', encoding='utf-8') as w:
+                json.dump({'scanned': self.scanned, 'fingerprint': self.fingerprint, 'records': self.index}, w)
+        except OSError:
+            pass
 
-            # Format line before using regexp
-            line = line.lower().strip().replace(' ', '').replace('\t', '').replace('\r', '').replace('\n', '')
 
-            # Check if there was a match, indicating data is present on this line
-            match = re.search('[\d]{1,3}>', line)
+def _iterrecords(fpath):
+    from swampsat2_archive import ArchiveReader, ArchiveWriter
+    from swampsat2_blocks import BlockReader, BlockWriter
 
-            # If a match was made
-            if match is not None:
+    fpath = os.path.normcase(fpath)
 
-                # Extract the data from the line and append to string
-                packet = packet + line[match.span()[1]:]
+    # Compressed block files and archives
+    with open(fpath, 'rb') as r:
+        isarchive = r.read(len(ArchiveWriter.magic)) == ArchiveWriter.magic
+        r.seek(0, os.SEEK_END)
+        if r.tell() >= len(BlockWriter.magic):
+            r.seek(-len(BlockWriter.magic), os.SEEK_END)
+            isblock = r.read() == BlockWriter.magic
+        else:
+            isblock = False
+
+    if isarchive:
+        for record in ArchiveReader(fpath).records(DecodeCache()):
+            yield record
+
+    elif isblock:
+        for record in BlockReader(fpath).records():
+            yield record
+
+    # JSON log files
+    else:
+        with open(fpath, 'rb') as r:
+            for _, _, text in _scanjson(r):
+                yield json.loads(text.decode('utf-8'), object_pairs_hook=OrderedDict)
+
+
+# UTC offsets (hours) of the time zone names found in beacon timestamps (abbreviations and Windows names)
+_zoneoffsets = {
+    'UTC': 0, 'GMT': 0, 'Z': 0, 'Coordinated Universal Time': 0,
+    'EST': -5, 'EDT': -4, 'CST': -6, 'CDT': -5, 'MST': -7, 'MDT': -6, 'PST': -8, 'PDT': -7,
+    'AKST': -9, 'AKDT': -8, 'HST': -10, 'AST': -4, 'ADT': -3,
+    'Eastern Standard Time': -5, 'Eastern Daylight Time': -4, 'Central Standard Time': -6, 'Central Daylight Time': -5,
+    'Mountain Standard Time': -7, 'Mountain Daylight Time': -6, 'Pacific Standard Time': -8, 'Pacific Daylight Time': -7,
+    'WET': 0, 'WEST': 1, 'BST': 1, 'CET': 1, 'CEST': 2, 'EET': 2, 'EEST': 3, 'MSK': 3,
+    'GMT Standard Time': 0, 'GMT Daylight Time': 1, 'W. Europe Standard Time': 1, 'W. Europe Daylight Time': 2,
+    'JST': 9, 'KST': 9, 'AWST': 8, 'ACST': 9.5, 'ACDT': 10.5, 'AEST': 10, 'AEDT': 11, 'NZST': 12, 'NZDT': 13,
+}
+
+
+def _utcoffset(zone):
+
+    # Named zones, then numeric offsets such as "+02", "-0330" or "UTC+05:30"
+    offset = _zoneoffsets.get(zone)
+    if offset is not None:
+        return int(offset * 3600)
+    match = re.match(r'^(?:UTC|GMT)?([+-])(\d{1,2}):?(\d{2})?$', zone)
+    if match is None:
+        return None
+    sign = -1 if match.group(1) == '-' else 1
+    return sign * (int(match.group(2)) * 3600 + int(match.group(3) or 0) * 60)
+
+
+def _wallseconds(timestamp):
+    import calendar
+    import time
+
+    # Seconds of the "%Y-%m-%d %H:%M:%S" part of a beacon timestamp (local wall clock, the time zone name is ignored)
+    return calendar.timegm(time.strptime(timestamp[:19], '%Y-%m-%d %H:%M:%S'))
 
-            else:
+
+def _timestampseconds(timestamp, zones=None):
+
+    # UTC seconds of a beacon timestamp, so logs from other time zones or across a DST change stay in order
+    zone = timestamp[19:].strip()
+    offset = _utcoffset(zone)
+
+    # Timestamps in a zone with an unknown offset can only be ordered against the same zone
+    if zones is not None and zone not in zones:
+        zones.add(zone)
+        unknown = sorted(name for name in zones if _utcoffset(name) is None)
+        if len(zones) > 1 and len(unknown) > 0:
+            raise ValueError('Timestamps in time zones "%s" cannot be ordered, the UTC offset of "%s" is unknown'
+                             % ('", "'.join(sorted(zones)), unknown[0]))
+
+    return _wallseconds(timestamp) - (offset or 0)
+
+
+def _sniffformat(fpath, size=8192):
+    # Only the start of the file is needed to tell the formats apart
+    with open(fpath, 'rb') as r:
+        head = r.read(size)
+
+    # KSS text export (frame headers or "N >" data lines)
+    if b'KISS Frame' in head or re.search(rb'^[ \t]*\d{1,3}[ \t]*>', head, re.M) is not None:
+        return '.kss'
+
+    # PuTTY log banner
+    if b'PuTTY log' in head:
+        return '.log'
+
+    # Raw KISS capture (starts with a frame end byte)
+    if head.startswith(b'\xc0'):
+        return '.kiss'
+
+    # Plain hex lines (PuTTY log without its banner, .txt or .hex file)
+    if re.search(rb'^[ \t]*[0-9A-Fa-f]{2}[0-9A-Fa-f \t]*\r?$', head, re.M) is not None:
+        return '.log'
+
+    # Raw KISS capture that was started in the middle of a frame
+    if b'\xc0' in head:
+        return '.kiss'
+
+    # Unknown format
+    return None
+
+
+def _readkss(fpath, offset=0, wholelines=False):
+    # Normalize path
+    fpath = os.path.normcase(fpath)
+
+    datalines = []
+    packet = ''
+
+    # Byte offset up to which every packet has been read
+    position = offset
+    consumed = offset
+
+    # Callsign
+    callsigns = 'AEA468AA8C40E0AE9664B092886103F0'.lower()
+
+    # Possible prefix and suffix
+    linewrappers = {'prefix': 'c000', 'suffix': 'c0'}
+
+    # Read file lines (starting from the byte offset of a previous read)
+    with open(fpath, 'rb') as r:
+        r.seek(offset)
+        for line in r:
+
+            # A last line without a line break may still be being written, leave it for the next read
+            if wholelines and not line.endswith((b'\n', b'\r')):
+                break
+
+            position += len(line)
+
+            # Try to decode the line using utf-8 character set
+            try:
+                line = line.decode('utf-8')
+
+            # Catch invalid utf-8 encodings, we can't do anything with these
+            except UnicodeDecodeError:
 
                 # If data was being collected
                 if packet != '':
@@ -659,54 +1203,172 @@ def _readkss(fpath):
                 # Reset packet string
                 packet = ''
 
+            # If there were no problems decoding
+            else:
+
+                # Format line before using regexp
+                line = line.lower().strip().replace(' ', '').replace('\t', '').replace('\r', '').replace('\n', '')
+
+                # Check if there was a match, indicating data is present on this line
+                match = re.search('[\d]{1,3}>', line)
+
+                # If a match was made
+                if match is not None:
+
+                    # Extract the data from the line and append to string
+                    packet = packet + line[match.span()[1]:]
+
+                else:
+
+                    # If data was being collected
+                    if packet != '':
+
+                        # Append that packet to the file's list
+                        datalines += [packet]
+
+                    # Reset packet string
+                    packet = ''
+
+            # Nothing is pending once a packet is complete
+            if packet == '':
+                consumed = position
+
+    # A packet running to the end of a finished file is complete
+    if packet != '' and not wholelines:
+        datalines += [packet]
+        consumed = position
+
     # Remove prefix and suffix
     trimmedlines = [line[len(linewrappers['prefix']):-len(linewrappers['suffix'])] if line.startswith(linewrappers['prefix']) and line.endswith(linewrappers['suffix']) else line for line in datalines]
 
     # Remove the callsigns
     datapackets = [re.split(callsigns, line)[1] if re.search(callsigns, line) is not None else line for line in trimmedlines]
 
-    return datapackets
+    return datapackets, consumed
 
 
-def _readputtylog(fpath):
-    import os
-
+def _readputtylog(fpath, offset=0, wholelines=False):
     # Normalize file path
     fpath = os.path.normcase(fpath)
 
-    # Read file contents
+    # Iterate through each line (starting from the byte offset of a previous read)
+    datapackets = []
+    validhex = '0123456789abcdef'
+    consumed = offset
     with open(fpath, 'rb') as r:
-        contents = r.read()
+        r.seek(offset)
+        for line in r:
 
-    # Split lines
-    rawlines = contents.splitlines()
+            # A last line without a line break may still be being written, leave it for the next read
+            if wholelines and not line.endswith((b'\n', b'\r')):
+                break
 
-    # Iterate through each line
-    datapackets = []
-    validhex = '0123456789abcdef'
-    for line in rawlines:
-        try:
+            # Every line is its own packet, so the file has been read up to here
+            consumed += len(line)
 
-            # Try to decode to utf-8
-            line = line.decode('utf-8')
+            try:
 
-        except UnicodeDecodeError:
+                # Try to decode to utf-8
+                line = line.decode('utf-8')
 
-            pass
+            except UnicodeDecodeError:
 
-        else:
+                pass
+
+            else:
+
+                # Format string
+                line = line.lower().strip().replace(' ', '').replace('\t', '').replace('\r', '').replace('\n', '')
+
+                # Check if it contains any non-hex characters
+                if not any(c not in validhex for c in line) and line != '':
+                    datapackets += [line]
+
+    return datapackets, consumed
+
+
+def _readkiss(fpath, offset=0, wholelines=False):
+    # Normalize file path
+    fpath = os.path.normcase(fpath)
+
+    # KISS framing bytes
+    fend = b'\xc0'
+
+    # Callsign
+    callsigns = bytes.fromhex('AEA468AA8C40E0AE9664B092886103F0')
+
+    # Turn the bytes between two frame ends into a hex packet
+    def _kissframe(frame):
 
-            # Format string
-            line = line.lower().strip().replace(' ', '').replace('\t', '').replace('\r', '').replace('\n', '')
+        # Only data frames (low nibble of the command byte is zero) carry telemetry
+        if len(frame) < 2 or frame[0] & 0x0f != 0:
+            return None
 
-            # Check if it contains any non-hex characters
-            if not any(c not in validhex for c in line) and line != '':
-                datapackets += [line]
+        # Undo the FESC escapes and drop the command byte
+        frame = bytes(frame[1:]).replace(b'\xdb\xdc', b'\xc0').replace(b'\xdb\xdd', b'\xdb')
 
-    return datapackets
+        # Remove the callsigns
+        index = frame.find(callsigns)
+        if index >= 0:
+            frame = frame[index + len(callsigns):]
+
+        return frame.hex() if len(frame) > 0 else None
+
+    datapackets = []
+    frame = bytearray()
+
+    # Byte offset up to which every frame has been read
+    position = offset
+    consumed = offset
+
+    # Read the file in chunks (starting from the byte offset of a previous read)
+    with open(fpath, 'rb') as r:
+        r.seek(offset)
+        for chunk in iter(lambda: r.read(65536), b''):
+            start = 0
+            end = chunk.find(fend)
+            while end >= 0:
+                frame += chunk[start:end]
+                packet = _kissframe(frame)
+                if packet is not None:
+                    datapackets += [packet]
+                frame = bytearray()
+                consumed = position + end + 1
+                start = end + 1
+                end = chunk.find(fend, start)
+            frame += chunk[start:]
+            position += len(chunk)
+
+    # A frame without its closing frame end may still be being written, leave it for the next read
+    if len(frame) > 0 and not wholelines:
+        packet = _kissframe(frame)
+        if packet is not None:
+            datapackets += [packet]
+        consumed = position
+
+    return datapackets, consumed
 
 
 def _readimage(datapackets, savepath, filler='00'):
+
+    image = _assembleimage(datapackets, filler)
+    if image is None:
+        return False
+    imbytes, nummissing, totalpackets = image
+
+    # Report the number of missing packets
+    print('\n\t\t %d missing data packets' % nummissing)
+
+    # Write image to file, if image data was found
+    if nummissing < totalpackets:
+        with open(savepath, 'wb') as rfile:
+            rfile.write(imbytes)
+
+    # Return true if any image data was found
+    return nummissing < totalpackets
+
+
+def _assembleimage(datapackets, filler='00'):
     from statistics import mode
     from math import ceil
 
@@ -734,7 +1396,7 @@ def _readimage(datapackets, savepath, filler='00'):
     imdata = [packet[16:] for packet in data]
 
     if len(totals) == 0:
-        return False
+        return None
 
     # Get the total number of packets to read
     totalpackets = mode(totals)
@@ -761,39 +1423,108 @@ def _readimage(datapackets, savepath, filler='00'):
     missingids = [i for i in range(len(packetids)) if i not in packetids]
     nummissing = len(missingids)
 
-    # Report the number of missing packets
-    print('\n\t\t %d missing data packets' % nummissing)
-
     # Add filler to image to replace missing data packets
     imfill = [filler * 248 if i not in packetids else imdata.pop(0) for i in range(ceil(totalpackets))]
 
     # Convert from list of hex strings to bytearray
     imbytes = bytearray(bytes.fromhex(''.join(imfill)))
 
-    # Write image to file, if image data was found
-    if nummissing < totalpackets:
-        with open(savepath, 'wb') as rfile:
-            rfile.write(imbytes)
+    return imbytes, nummissing, totalpackets
+
+
+# Public names of the submodules, which are only imported when first used (most runs need none of them)
+_submodules = {
+    'BlockWriter': 'swampsat2_blocks', 'BlockReader': 'swampsat2_blocks',
+    'SqliteSink': 'swampsat2_sqlite',
+    'ArchiveWriter': 'swampsat2_archive', 'ArchiveReader': 'swampsat2_archive',
+    'mergestreams': 'swampsat2_export', 'bucketize': 'swampsat2_export', 'lttb': 'swampsat2_export',
+    'downsample': 'swampsat2_export', 'segmentpasses': 'swampsat2_export', 'summarizepass': 'swampsat2_export',
+    'summarizepasses': 'swampsat2_export',
+    'serve': 'swampsat2_serve',
+}
+
+
+def __getattr__(name):
+    from importlib import import_module
+
+    # "from swampsat2 import BlockReader" keeps working
+    if name not in _submodules:
+        raise AttributeError("module 'swampsat2' has no attribute '%s'" % name)
+    return getattr(import_module(_submodules[name]), name)
+
+
+def _quickoptions(argv):
+
+    # Options of the plain "swampsat2 [-l LOGFILE] [-d DELIMITER] [-v] -s HEXSTRING" form, as docopt would return them
+    options = {'--file': None, '--hexstring': None, '--logfile': '[$HOME]/ss2logs/ss2beacon_parsed_[$TIMESTAMP].json',
+               '--filetype': None, '--image': False, '--delimiter': None, '--limits': None, '--cache': None,
+               '--checkpoint': None, '--compress': None, '--sqlite': None, '--archive': None, '--fields': None,
+               '--bucket': None, '--points': None, '--gap': '600', '--workers': None, '--host': '127.0.0.1',
+               '--port': '8020', '--verbose': False, 'merge': False, 'export': False, 'passes': False, 'serve': False,
+               'STREAM': [], 'LOG': None}
+    names = {'-s': '--hexstring', '-l': '--logfile', '-d': '--delimiter',
+             '--hexstring': '--hexstring', '--logfile': '--logfile', '--delimiter': '--delimiter'}
+
+    # Anything else (or anything unusual, such as an option given twice) is left to docopt
+    args = list(argv)
+    seen = set()
+    while len(args) > 0:
+        arg = args.pop(0)
+        if arg in ('-v', '--verbose'):
+            name, value = '--verbose', True
+        elif arg.startswith('--') and '=' in arg and arg.split('=', 1)[0] in names:
+            name, value = arg.split('=', 1)
+            name = names[name]
+        elif arg in names and len(args) > 0 and not args[0].startswith('-'):
+            name, value = names[arg], args.pop(0)
+        else:
+            return None
+        if name in seen:
+            return None
+        seen.add(name)
+        options[name] = value
 
-    # Return true if any image data was found
-    return nummissing < totalpackets
+    if options['--hexstring'] is None:
+        return None
+
+    return options
 
 
 def main():
-    import os
-    import datetime
-    import re
+    import sys
 
-    # Parse options based on docstring above
-    options = docopt(__doc__, version='1.1.2')
+    # The plain "-s HEXSTRING" form is read directly, docopt (and its import) is only needed for everything else
+    options = _quickoptions(sys.argv[1:])
+    if options is None:
+        from docopt import docopt
+
+        # Parse options based on docstring above
+        options = docopt(__doc__, version='1.1.2')
 
     print('SwampSat II Beacon Parser (UF CubeSat)\n')
 
+    # Run the decode service until interrupted
+    if options['serve']:
+        from swampsat2_serve import serve
+
+        workers = int(options['--workers']) if options['--workers'] is not None else None
+        cache = DecodeCache(int(options['--cache'])) if options['--cache'] is not None else None
+        print('\tDecode service listening on http://' + options['--host'] + ':' + options['--port'])
+        try:
+            serve(options['--host'], int(options['--port']), workers, cache)
+        except KeyboardInterrupt:
+            pass
+        return
+
     # Look for either a file path or raw HEX string
     mode = 0
     if options['--file'] is not None and len(options['--file']) > 0:
         mode |= 1
         file = os.path.normcase(options['--file'])
+
+        # A directory is named like a file (without a trailing separator) for the default log path
+        if os.path.isdir(file):
+            file = file.rstrip('\\/') or file
     else:
         file = ''
 
@@ -803,6 +1534,25 @@ def main():
     else:
         hexstring = ''
 
+    # Look for streams of parsed data to merge
+    if options['merge']:
+        mode |= 4
+        streams = options['STREAM']
+    else:
+        streams = []
+
+    # Look for parsed data to export
+    if options['export']:
+        mode |= 8
+        exportlog = options['LOG']
+    else:
+        exportlog = ''
+
+    # Look for parsed data to summarize by pass
+    if options['passes']:
+        mode |= 16
+        exportlog = options['LOG']
+
     # Raise an error if no input is found
     if mode == 0:
         raise IOError('A filepath or raw HEX string is required')
@@ -835,6 +1585,21 @@ def main():
 
             lpath = lpath.replace(os.path.normcase('[$HOME]'), os.path.expanduser('~'))  # Replace the $HOME placeholder with the OS/user corrected home folder
 
+        # If the default logpath is used to merge streams, place the merged log in the home folder
+        elif mode == 4:
+
+            lpath = lpath.replace('ss2beacon_parsed_', 'ss2beacon_merged_')
+
+        # If the default logpath is used to export data, place the export in the home folder
+        elif mode == 8:
+
+            lpath = lpath.replace('ss2beacon_parsed_', 'ss2beacon_export_')
+
+        # If the default logpath is used for pass summaries, place the summaries in the home folder
+        elif mode == 16:
+
+            lpath = lpath.replace('ss2beacon_parsed_', 'ss2beacon_passes_')
+
     else:
 
         # Check if a directory was specified by looking for a file extension
@@ -854,6 +1619,18 @@ def main():
     if options['--image']:
         lpath = os.path.splitext(lpath)[0] + '.jpg'
 
+    # Save to the database instead of the log file
+    elif options['--sqlite'] is not None and len(options['--sqlite']) > 0:
+        lpath = os.path.normcase(options['--sqlite']).replace(os.path.normcase('[$HOME]'), os.path.expanduser('~'))
+
+    # Replace the file extension if data is exported
+    elif mode == 8:
+        lpath = os.path.splitext(lpath)[0] + '.csv'
+
+    # Replace the file extension if the parsed data is compressed
+    elif options['--compress'] is not None and len(options['--compress']) > 0:
+        lpath = os.path.splitext(lpath)[0] + '.ss2blk'
+
     # Make directory path to the logfile, if it doesn't already exist
     try:
         os.makedirs(os.path.split(lpath)[0], exist_ok=True)
@@ -866,106 +1643,291 @@ def main():
     else:
         delimiter = ''
 
-    # If a raw HEX string was provided
-    if mode == 2:
-
-        # Call the parser
-        output = ParseDownlink.parserecord(hexstring, lpath, delimiter)
+    # Compile the telemetry limits, if provided
+    if options['--limits'] is not None and len(options['--limits']) > 0:
+        limits = LimitChecker.load(options['--limits'])
+    else:
+        limits = None
+    alarms = 0
 
-        # Check for parsed data
-        if len(output) > 0:
-            print('\tString successfully read')
-            print('\tLog file created:', lpath)
+    # Count decoded beacons and the reasons lines were skipped
+    stats = DecodeStats()
+    verbose = options['--verbose']
 
-    # If a file path was provided
-    elif mode == 1:
+    # Create the decode cache, if requested
+    if options['--cache'] is not None and len(options['--cache']) > 0:
+        cache = DecodeCache(int(options['--cache']))
+    else:
+        cache = None
+
+    # Write compressed blocks or database rows instead of appending JSON to the log file, if requested
+    if options['--compress'] is not None and len(options['--compress']) > 0 and not options['--image']:
+        from swampsat2_blocks import BlockWriter
+        writer = BlockWriter(lpath, options['--compress'].lower())
+    elif options['--sqlite'] is not None and len(options['--sqlite']) > 0 and not options['--image']:
+        from swampsat2_sqlite import SqliteSink
+        writer = SqliteSink(lpath)
+    else:
+        writer = None
 
-        # Read file extension from file path
-        if options['--filetype'] is None:
+    # Archive the raw telemetry as well, if requested
+    if options['--archive'] is not None and len(options['--archive']) > 0 and not options['--image']:
+        from swampsat2_archive import ArchiveWriter
+        archive = ArchiveWriter(os.path.normcase(options['--archive']).replace(os.path.normcase('[$HOME]'), os.path.expanduser('~')))
+    else:
+        archive = None
 
-            # .kss file
-            if os.path.splitext(file)[1].lower() == '.kss':
-                options['--filetype'] = '.kss'
+    try:
 
-            # .txt or .log file
-            elif os.path.splitext(file)[1].lower() == '.log' or os.path.splitext(file)[1].lower() == '.txt' or os.path.splitext(file)[1].lower() == '.hex':
-                options['--filetype'] = '.log'
+        # If a raw HEX string was provided
+        if mode == 2:
 
-            # No valid file path found
+            # Call the parser
+            obj = ParseDownlink(hexstring, delimiter, limits, cache)
+            output = obj.compileddata
+            if len(output) > 0:
+                if writer is None:
+                    obj.record(lpath)
+                else:
+                    writer.write(output)
+                if archive is not None and (len(obj.raw) > 0 or output['msgtype'] == 0):
+                    archive.write(output['timestamp'], obj.raw, msgtype=output['msgtype'])
+
+            # Check for parsed data
+            if obj.error is not None:
+                print('\t' + obj.error.message)
+            elif len(output) > 0:
+                print('\tString successfully read')
+                if len(output.get('alarms', [])) > 0:
+                    print('\tLimit violations:', len(output['alarms']))
+                print('\tLog file created:', lpath)
+
+        # If a file path was provided
+        elif mode == 1:
+
+            # Reader for each input format
+            readers = {'.kss': _readkss, '.log': _readputtylog, '.kiss': _readkiss}
+
+            # File types that share a format
+            filetypes = {'.kss': '.kss', '.log': '.log', '.txt': '.log', '.hex': '.log', '.kiss': '.kiss'}
+
+            # Look up the specified file type (the format is sniffed from each file otherwise)
+            if options['--filetype'] is not None:
+                filetype = options['--filetype'].lower().strip()
+                filetype = filetypes.get(filetype if filetype.startswith('.') else '.' + filetype)
+
+                # an unrecognized file type was specified
+                if filetype is None:
+                    raise IOError('Log file extension must be either: {".txt", ".log", ".hex", ".kss", ".kiss"}')
             else:
-                raise IOError('Log file extension must be either: {".txt", ".log", ".hex", ".kss"}')
-
-        # .kss file type was specified
-        elif re.search('.kss', options['--filetype'].lower()) is not None:
-            options['--filetype'] = '.kss'
+                filetype = None
 
-        # .txt or .log file type was specified
-        elif re.search('.log', options['--filetype'].lower()) is not None or re.search('.txt', options['--filetype'].lower()) is not None \
-                or re.search('.hex', options['--filetype'].lower()) is not None:
-            options['--filetype'] = '.log'
-
-        # an unrecognized file type was specified
-        else:
-            raise IOError('Log file extension must be either: {".txt", ".log", ".hex", ".kss"}')
-
-        # Open and read the file according to its expected format
-        fpath = os.path.normcase(file.strip())
-        if options['--filetype'] == '.log':
-            contents = _readputtylog(fpath)
+            # Read every file of a directory, formats may be mixed
+            if os.path.isdir(file):
+                fpaths = [os.path.join(file, fname) for fname in sorted(os.listdir(file)) if not fname.startswith('.') and os.path.isfile(os.path.join(file, fname))]
+            else:
+                fpaths = [os.path.normcase(file.strip())]
 
-            # Try reading the other format (test for user input error)
-            if len(contents) == 0:
-                contents = _readkss(fpath)
+            # Look up where the previous run stopped reading (images always need the whole file)
+            if options['--checkpoint'] is not None and len(options['--checkpoint']) > 0 and not options['--image']:
+                checkpoint = Checkpoint(options['--checkpoint'])
+            else:
+                checkpoint = None
+
+            counter = 0
+            imagepackets = []
+            for fpath in fpaths:
+
+                # Only print the file name when several files are read
+                prefix = '\t' + os.path.split(fpath)[1] + ': ' if len(fpaths) > 1 else '\t'
+
+                offset = checkpoint.resume(fpath) if checkpoint is not None else 0
+                if offset is None:
+                    print(prefix + 'File unchanged since last read')
+                    continue
+                elif offset > 0:
+                    print(prefix + 'Resuming file from byte ' + str(offset) + '\n')
+
+                # Sniff the format from the start of the file, fall back on the file extension
+                ftype = filetype
+                if ftype is None:
+                    ftype = _sniffformat(fpath)
+                if ftype is None:
+                    ftype = filetypes.get(os.path.splitext(fpath)[1].lower())
+
+                # Open and read the file according to its format
+                if ftype is not None:
+                    contents, consumed = readers[ftype](fpath, offset, checkpoint is not None and not checkpoint.settled(fpath))
+                else:
+                    contents = []
 
-                if len(contents) > 0:
-                    print('\tSwitched to read .kss format and found valid formatting\n')
+                # Catch no valid data error
+                if len(contents) == 0:
+                    print(prefix + 'No valid data found in file')
 
-        else:  # options['--filetype'] == '.kss'
-            contents = _readkss(fpath)
+                    # The file is read from the same place next time
+                    consumed = offset
 
-            # Try reading the other format (test for user input error)
-            if len(contents) == 0:
-                contents = _readputtylog(fpath)
+                # Image packets are assembled once every file is read
+                elif options['--image']:
+                    imagepackets += contents
 
-                if len(contents) > 0:
-                    print('\tSwitched to read .log/.txt format and found valid formatting\n')
+                # Beacon parser
+                else:
 
-        # If data was read
-        if len(contents) > 0:
+                    # Attempt to parse each line in the file
+                    lines = 0
+                    for line in contents:
+
+                        # Call the parser
+                        obj = ParseDownlink(line, delimiter, limits, cache)
+                        output = obj.compileddata
+                        stats.add(obj.error)
+
+                        # Check for parsed data
+                        if obj.error is None:
+                            if writer is None:
+                                obj.record(lpath)
+                            else:
+                                writer.write(output)
+                            if archive is not None and (len(obj.raw) > 0 or output['msgtype'] == 0):
+                                archive.write(output['timestamp'], obj.raw, msgtype=output['msgtype'])
+                            if verbose:
+                                print('\t\t+ Line successfully read')
+                            lines += 1
+                            alarms += len(output.get('alarms', []))
+                        elif verbose:
+                            print('\t\t  ' + obj.error.message)
+
+                    counter += lines
+                    if len(fpaths) > 1:
+                        print(prefix + str(lines) + ' lines read')
+
+                # Remember how far the file was read
+                if checkpoint is not None:
+                    checkpoint.update(fpath, consumed)
+
+            if checkpoint is not None:
+                checkpoint.save()
 
             # Image parser
             if options['--image']:
 
                 # Read image
-                if _readimage(contents, lpath):
-                    print('\n\tImage read successfully')
+                if len(imagepackets) > 0:
+                    if _readimage(imagepackets, lpath):
+                        print('\n\tImage read successfully')
+                        print('\tLog file created:', lpath)
+                    else:
+                        print('\n\tNo image data found')
+
+            # Summary of the beacons read
+            elif stats.decoded + sum(stats.errors.values()) > 0:
+                print('\n\tSuccessfully read: ' + str(counter) + ' lines from ' + ('file' if len(fpaths) == 1 else str(len(fpaths)) + ' files'))
+                print('\tDecode summary: ' + str(stats))
+                if limits is not None:
+                    print('\tLimit violations: ' + str(alarms))
+                if cache is not None:
+                    print('\tDecode cache: ' + str(cache.hits) + ' hits, ' + str(cache.misses) + ' misses')
+                if counter > 0:
                     print('\tLog file created:', lpath)
-                else:
-                    print('\n\tNo image data found')
 
-            # Beacon parser
+        # If parsed data from several stations was provided
+        elif mode == 4:
+            from swampsat2_export import mergestreams
+
+            # Streams are given as "STATION=FILE", the station name defaults to the file name
+            sources = []
+            for stream in streams:
+                if '=' in stream:
+                    station, spath = stream.split('=', 1)
+                else:
+                    spath = stream
+                    station = os.path.split(os.path.splitext(spath)[0])[1]
+                    if station.endswith('_parsed'):
+                        station = station[:-len('_parsed')]
+                sources.append((station, _iterrecords(spath)))
+
+            # Write the merged stream
+            counter = 0
+            if writer is None:
+                with open(lpath, 'at', encoding='utf-8') as lfile:
+                    for record in mergestreams(sources):
+                        json.dump(record, lfile, indent=4)
+                        lfile.write('\n')
+                        counter += 1
             else:
+                for record in mergestreams(sources):
+                    writer.write(record)
+                    counter += 1
+
+            print('\tSuccessfully merged: ' + str(counter) + ' records from ' + str(len(sources)) + ' stations')
+            if counter > 0:
+                print('\tLog file created:', lpath)
+
+        # If parsed data was provided for export
+        elif mode == 8:
+            import csv
+            from swampsat2_export import bucketize, downsample
+
+            fields = None
+            if options['--fields'] is not None and len(options['--fields']) > 0:
+                fields = [field.strip() for field in options['--fields'].split(',') if field.strip() != '']
+
+            # Check the bucket width or number of points before anything is written
+            if options['--bucket'] is not None and int(options['--bucket']) <= 0:
+                raise IOError('Bucket width must be a positive number of seconds')
+            if options['--points'] is not None and int(options['--points']) < 3:
+                raise IOError('Number of points must be at least 3')
+
+            # Downsample in one pass over the parsed data
+            if options['--bucket'] is not None:
+                rows = bucketize(_iterrecords(exportlog), int(options['--bucket']), fields)
+                columns = ['timestamp', 'field', 'min', 'max', 'mean', 'count']
+            else:
+                rows = downsample(_iterrecords(exportlog), int(options['--points']), fields)
+                columns = ['field', 'timestamp', 'value']
+
+            counter = 0
+            with open(lpath, 'wt', encoding='utf-8', newline='') as lfile:
+                csvwriter = csv.DictWriter(lfile, columns)
+                csvwriter.writeheader()
+                for row in rows:
+                    csvwriter.writerow(row)
+                    counter += 1
+
+            print('\tSuccessfully exported: ' + str(counter) + ' rows')
+            print('\tLog file created:', lpath)
 
-                # Attempt to parse each line in the file
-                counter = 0
-                for line in contents:
+        # If parsed data was provided to summarize by pass
+        elif mode == 16:
+            from swampsat2_export import summarizepasses
 
-                    # Call the parser
-                    output = ParseDownlink.parserecord(line, lpath, delimiter)
+            workers = int(options['--workers']) if options['--workers'] is not None else None
 
-                    # Check for parsed data
-                    if len(output) > 0:
-                        print('\t\t+ Line successfully read')
-                        counter += 1
+            counter = 0
+            with open(lpath, 'at', encoding='utf-8') as lfile:
+                for summary in summarizepasses(_iterrecords(exportlog), int(options['--gap']), workers):
+                    json.dump(summary, lfile, indent=4)
+                    lfile.write('\n')
+                    counter += 1
 
-                print('\n\tSuccessfully read: ' + str(counter) + ' lines from file')
-                if counter > 0:
-                    print('\tLog file created:', lpath)
+            print('\tPasses found: ' + str(counter))
+            if counter > 0:
+                print('\tLog file created:', lpath)
 
-        # Catch no valid data error
-        else:
-            print('\tNo valid data found in file')
+    finally:
+
+        # Write the last block and the block index (or the last database rows), even if the run is interrupted
+        if writer is not None:
+            writer.close()
+        if archive is not None:
+            archive.close()
 
 
 if __name__ == "__main__":
+    import sys
+
+    # The submodules import from "swampsat2", which is this script, rather than a second copy of it
+    sys.modules.setdefault('swampsat2', sys.modules[__name__])
     main()
@@ -0,0 +1,333 @@
+# MIT License
+#
+# Copyright (c) 2020 Ralen Toledo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Delta/bit-packed archive of the raw telemetry words (--archive)
+
+import os
+
+from swampsat2 import DecodeError, ParseDownlink, _wallseconds
+
+
+def _writevarint(buf, n):
+    while n >= 0x80:
+        buf.append((n & 0x7f) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+
+def _readvarint(data, pos):
+    n = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+
+def _packcolumn(buf, values):
+
+    # Delta (zigzag) and XOR encode against the previous value and keep whichever needs fewer bits
+    first = values[0]
+    deltas = [((b - a) << 1) ^ ((b - a) >> 63) for a, b in zip(values, values[1:])]
+    xors = [a ^ b for a, b in zip(values, values[1:])]
+    deltawidth = max(deltas, default=0).bit_length()
+    xorwidth = max(xors, default=0).bit_length()
+    if xorwidth < deltawidth:
+        mode, width, encoded = 1, xorwidth, xors
+    else:
+        mode, width, encoded = 0, deltawidth, deltas
+
+    buf.append(mode)
+    buf.append(width)
+    _writevarint(buf, first)
+
+    # Bit-pack the encoded values (constant columns take no space), eight values fill exactly "width" bytes
+    if width > 0 and len(encoded) > 0:
+        nbytes = (len(encoded) * width + 7) // 8
+        packed = bytearray()
+        for i in range(0, len(encoded), 8):
+            group = encoded[i:i + 8]
+            acc = 0
+            for value in group:
+                acc = (acc << width) | value
+            packed += (acc << (8 - len(group)) * width).to_bytes(width, 'big')
+        buf += packed[:nbytes]
+
+
+def _unpackcolumn(data, pos, count):
+    mode, width = data[pos], data[pos + 1]
+    first, pos = _readvarint(data, pos + 2)
+
+    values = [first]
+    if count <= 1:
+        return values, pos
+    if width == 0:
+        return values * count, pos
+
+    nbytes = ((count - 1) * width + 7) // 8
+    packed = bytes(data[pos:pos + nbytes])
+    pos += nbytes
+
+    # Unpack groups of eight values ("width" bytes each, the last group is zero padded)
+    mask = (1 << width) - 1
+    shifts = [width * (7 - k) for k in range(8)]
+    packed += bytes(-len(packed) % width)
+    encoded = []
+    for i in range(0, len(packed), width):
+        acc = int.from_bytes(packed[i:i + width], 'big')
+        encoded += [(acc >> shift) & mask for shift in shifts]
+    del encoded[count - 1:]
+
+    # Undo the delta (zigzag) or XOR encoding
+    previous = first
+    if mode == 0:
+        for value in encoded:
+            previous += (value >> 1) ^ -(value & 1)
+            values.append(previous)
+    else:
+        for value in encoded:
+            previous ^= value
+            values.append(previous)
+    return values, pos
+
+
+class ArchiveWriter:
+
+    # File signature
+    magic = b'SS2ARC01'
+
+    # Sizes (bytes) of the raw little endian words of each beacon type, in payload order
+    eps = [2] * 58
+    battery = [2] * 7 + [1]
+    vutrx = [1, 2, 2, 1, 2, 1, 1, 1, 2, 2, 1, 2, 2, 2, 2, 2, 2]
+    ants = [2, 2]
+    stx = [2, 2, 2, 2, 2, 2, 1, 1, 2, 2, 1, 2, 1]
+    layouts = {3: eps + battery + vutrx + ants, 4: eps + battery + vutrx + ants + stx}
+
+    # Struct formats of the layouts
+    formats = {3: '<' + ''.join('H' if size == 2 else 'B' for size in eps + battery + vutrx + ants),
+               4: '<' + ''.join('H' if size == 2 else 'B' for size in eps + battery + vutrx + ants + stx)}
+
+    def __init__(self, path, blocksize=4096):
+        self.path = os.path.normcase(path)
+        self.blocksize = blocksize
+        self._pending = []
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, timestamp, payload, dlim='', msgtype=None):
+        import struct
+
+        # Bytes already cleaned by the decoder (with their message type) are used as they are, hex strings are checked
+        if isinstance(payload, (bytes, bytearray)) and msgtype is not None:
+            data = payload
+            if msgtype != 0 and len(data) != struct.calcsize(ArchiveWriter.formats[msgtype]):
+                raise DecodeError('length')
+        else:
+            hexstr, _ = ParseDownlink._cleaninput(payload, dlim)
+            hexstr = ''.join(hexstr)
+
+            # Only whole bytes are archived, the acknowledgement carries no telemetry so a trailing half byte is ignored
+            data = bytes.fromhex(hexstr) if len(hexstr) % 2 == 0 else b''
+            msgtype = ParseDownlink.beaconlens.get(len(data))
+            if msgtype is None:
+                if ParseDownlink.acknowledgement in hexstr:
+                    msgtype = 0
+                else:
+                    raise DecodeError('length')
+
+        # Split the payload into its raw integer words (the values before any scale factors)
+        words = struct.unpack(ArchiveWriter.formats[msgtype], data) if msgtype != 0 else ()
+
+        self._pending.append((timestamp, msgtype, words))
+        if len(self._pending) >= self.blocksize:
+            self.flush()
+
+    def flush(self):
+        if len(self._pending) == 0:
+            return
+
+        if self._file is None:
+            self._open()
+
+        block = bytearray()
+        _writevarint(block, len(self._pending))
+
+        # Timestamps as seconds plus a table of the time zone names
+        zones = []
+        zoneids = []
+        for timestamp, _, _ in self._pending:
+            zone = timestamp[19:]
+            if zone not in zones:
+                zones.append(zone)
+            zoneids.append(zones.index(zone))
+        _writevarint(block, len(zones))
+        for zone in zones:
+            encoded = zone.encode('utf-8')
+            _writevarint(block, len(encoded))
+            block += encoded
+        _packcolumn(block, [_wallseconds(timestamp) for timestamp, _, _ in self._pending])
+        _packcolumn(block, zoneids)
+        _packcolumn(block, [msgtype for _, msgtype, _ in self._pending])
+
+        # One column per raw word of each beacon type
+        for msgtype in (3, 4):
+            rows = [words for _, mtype, words in self._pending if mtype == msgtype]
+            _writevarint(block, len(rows))
+            if len(rows) > 0:
+                for column in zip(*rows):
+                    _packcolumn(block, column)
+
+        header = bytearray()
+        _writevarint(header, len(block))
+        self._file.write(header + block)
+        self._pending = []
+
+        # Hand complete blocks to the OS, an interrupted run only loses the block being written
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _open(self):
+        # Create path directory tree if it doesn't already exist
+        try:
+            os.makedirs(os.path.split(self.path)[0], exist_ok=True)
+        except OSError:
+            pass
+
+        # Append after the last complete block of an existing archive
+        if os.path.isfile(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as r:
+                if r.read(len(ArchiveWriter.magic)) != ArchiveWriter.magic:
+                    raise IOError('Not a SwampSat II archive: ' + self.path)
+                end = ArchiveReader._end(r)
+            self._file = open(self.path, 'r+b')
+
+            # Only a partly written block (from an interrupted run) is cut off
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(self.path, 'wb')
+            self._file.write(ArchiveWriter.magic)
+
+
+class ArchiveReader:
+
+    def __init__(self, path):
+        self.path = os.path.normcase(path)
+
+    def payloads(self):
+        import struct
+        import time
+
+        with open(self.path, 'rb') as r:
+            if r.read(len(ArchiveWriter.magic)) != ArchiveWriter.magic:
+                raise IOError('Not a SwampSat II archive: ' + self.path)
+
+            # The acknowledgement carries no telemetry, any copy of it decodes the same
+            acknowledgement = 'Gator Nation Is Everywhere! From SwampSat II'.encode('utf-8').hex()
+
+            while True:
+
+                # The archive ends at the last complete block, a block cut short by an interrupted write is ignored
+                length = ArchiveReader._readheader(r)
+                if length is None:
+                    return
+                block = r.read(length)
+                if len(block) < length:
+                    return
+
+                count, pos = _readvarint(block, 0)
+                numzones, pos = _readvarint(block, pos)
+                zones = []
+                for _ in range(numzones):
+                    size, pos = _readvarint(block, pos)
+                    zones.append(block[pos:pos + size].decode('utf-8'))
+                    pos += size
+                seconds, pos = _unpackcolumn(block, pos, count)
+                zoneids, pos = _unpackcolumn(block, pos, count)
+                msgtypes, pos = _unpackcolumn(block, pos, count)
+
+                # Rebuild the payloads from the word columns of each beacon type
+                payloads = {}
+                for msgtype in (3, 4):
+                    rows, pos = _readvarint(block, pos)
+                    columns = []
+                    if rows > 0:
+                        for _ in ArchiveWriter.layouts[msgtype]:
+                            column, pos = _unpackcolumn(block, pos, rows)
+                            columns.append(column)
+                    packer = struct.Struct(ArchiveWriter.formats[msgtype])
+                    payloads[msgtype] = iter([packer.pack(*words).hex() for words in zip(*columns)])
+
+                for i in range(count):
+                    timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds[i])) + zones[zoneids[i]]
+                    if msgtypes[i] == 0:
+                        yield timestamp, acknowledgement
+                    else:
+                        yield timestamp, next(payloads[msgtypes[i]])
+
+    def records(self, cache=None):
+        for timestamp, payload in self.payloads():
+            record = ParseDownlink.parse(payload, cache=cache)
+            record['timestamp'] = timestamp
+            yield record
+
+    @staticmethod
+    def _readheader(r):
+
+        # Length of the block at the current position, None at the end of the file (or of a partly written header)
+        header = bytearray()
+        while True:
+            byte = r.read(1)
+            if len(byte) == 0:
+                return None
+            header += byte
+            if byte[0] < 0x80:
+                return _readvarint(header, 0)[0]
+
+    @staticmethod
+    def _end(r):
+        r.seek(0, os.SEEK_END)
+        size = r.tell()
+
+        # Skip from header to header, the offset just after the last complete block
+        end = len(ArchiveWriter.magic)
+        r.seek(end)
+        while True:
+            length = ArchiveReader._readheader(r)
+            if length is None or r.tell() + length > size:
+                return end
+            end = r.tell() + length
+            r.seek(end)
@@ -0,0 +1,270 @@
+# MIT License
+#
+# Copyright (c) 2020 Ralen Toledo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Compressed, indexed block files of parsed data (--compress)
+
+import json
+import os
+
+
+class BlockWriter:
+
+    # File signature written after the footer index
+    magic = b'SS2BLK01'
+
+    def __init__(self, path, codec='gzip', blocksize=1024, level=6):
+        if codec not in ('gzip', 'lzma'):
+            raise ValueError('Compression codec must be either: {"gzip", "lzma"}')
+
+        self.path = os.path.normcase(path)
+        self.codec = codec
+        self.blocksize = blocksize
+        self.level = level
+        self.index = []
+        self._previous = None
+        self._pending = []
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.blocksize:
+            self.flush()
+
+    def flush(self):
+        if len(self._pending) == 0:
+            return
+
+        if self._file is None:
+            self._open()
+
+        # Compact JSON lines, one record per line, compressed as an independent block
+        data = '\n'.join(json.dumps(record, separators=(',', ':')) for record in self._pending).encode('utf-8')
+        block = BlockWriter._compress(data, self.codec, self.level)
+
+        self.index.append([self._file.tell(), len(block), self._pending[0].get('timestamp', ''), len(self._pending)])
+        self._file.write(block)
+        self._pending = []
+
+        # Hand complete blocks to the OS, an interrupted run can still recover them
+        self._file.flush()
+
+    def close(self):
+        import struct
+
+        self.flush()
+        if self._file is None:
+            return
+
+        # Footer: index of the blocks written since the previous footer (which it points to), its length, then the file signature
+        footer = json.dumps({'codec': self.codec, 'blocks': self.index, 'previous': self._previous},
+                            separators=(',', ':')).encode('utf-8')
+        self._file.write(footer + struct.pack('<Q', len(footer)) + BlockWriter.magic)
+        self._file.close()
+        self._file = None
+
+    def _open(self):
+        # Create path directory tree if it doesn't already exist
+        try:
+            os.makedirs(os.path.split(self.path)[0], exist_ok=True)
+        except OSError:
+            pass
+
+        # Append to an existing block file after its last footer, which stays in place until the new one is written
+        if os.path.isfile(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, 'rb') as r:
+                codec, footerend, recovered, end = BlockReader._tail(r)
+            if codec != self.codec:
+                raise IOError('Block file was written with the "%s" codec' % codec)
+
+            # Blocks left without a footer by an interrupted run are indexed by the new footer
+            self.index = recovered
+            self._previous = footerend
+            self._file = open(self.path, 'r+b')
+
+            # Only an unreadable, partly written block is cut off
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(self.path, 'wb')
+
+    @staticmethod
+    def _compress(data, codec, level):
+        if codec == 'gzip':
+            import gzip
+            return gzip.compress(data, compresslevel=level)
+        else:
+            import lzma
+            return lzma.compress(data, preset=level)
+
+
+class BlockReader:
+
+    def __init__(self, path):
+        self.path = os.path.normcase(path)
+
+        with open(self.path, 'rb') as r:
+            self.codec, footerend, recovered, _ = BlockReader._tail(r)
+
+            # Follow the footers of earlier runs back to the start of the file
+            indexes = [recovered]
+            while footerend is not None:
+                footer = BlockReader._readfooter(r, footerend)
+                if footer is None:
+                    raise IOError('Broken block index in: ' + self.path)
+                indexes.append(footer[1]['blocks'])
+                footerend = footer[1].get('previous')
+
+        self.index = [entry for blocks in reversed(indexes) for entry in blocks]
+
+    def __len__(self):
+        return sum(count for _, _, _, count in self.index)
+
+    def block(self, i):
+        # Seek to and decompress a single block
+        offset, length, _, _ = self.index[i]
+        with open(self.path, 'rb') as r:
+            r.seek(offset)
+            data = BlockReader._decompress(r.read(length), self.codec)
+        return [json.loads(line) for line in data.decode('utf-8').split('\n')]
+
+    def records(self, start=None, end=None):
+        from bisect import bisect_right
+
+        # Blocks are written in time order, so only the blocks overlapping [start, end] are decompressed
+        firsts = [first for _, _, first, _ in self.index]
+        first = 0 if start is None else max(bisect_right(firsts, start) - 1, 0)
+        last = len(self.index) if end is None else bisect_right(firsts, end + '\uffff')
+
+        for i in range(first, last):
+            for record in self.block(i):
+                timestamp = record.get('timestamp', '')
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp[:len(end)] > end:
+                    return
+                yield record
+
+    @staticmethod
+    def _tail(r):
+        r.seek(0, os.SEEK_END)
+        size = r.tell()
+
+        # The last footer is normally at the very end, an interrupted run leaves it further up
+        footerend, footer = size, BlockReader._readfooter(r, size)
+        if footer is None:
+            footerend, footer = BlockReader._findfooter(r, size)
+        codec = None if footer is None else footer[1]['codec']
+
+        # Index the complete blocks written after the last footer
+        codec, recovered, end = BlockReader._scanblocks(r, footerend or 0, codec)
+        if codec is None:
+            raise IOError('Not a SwampSat II block file: ' + getattr(r, 'name', ''))
+        return codec, footerend, recovered, end
+
+    @staticmethod
+    def _readfooter(r, end):
+        import struct
+
+        # Footer whose signature ends at byte "end", None if there is none
+        trailer = len(BlockWriter.magic) + 8
+        if end < trailer:
+            return None
+        r.seek(end - trailer)
+        footerlen, magic = struct.unpack('<Q', r.read(8))[0], r.read(len(BlockWriter.magic))
+        if magic != BlockWriter.magic or footerlen > end - trailer:
+            return None
+        start = end - trailer - footerlen
+        r.seek(start)
+        try:
+            footer = json.loads(r.read(footerlen).decode('utf-8'))
+        except ValueError:
+            return None
+        if not isinstance(footer, dict) or 'blocks' not in footer:
+            return None
+        return start, footer
+
+    @staticmethod
+    def _findfooter(r, size, window=1 << 20):
+        magic = BlockWriter.magic
+
+        # Search backwards for the last valid footer signature
+        pos = size
+        while pos > 0:
+            start = max(0, pos - window)
+            r.seek(start)
+            chunk = r.read(pos - start + len(magic) - 1)
+            i = chunk.rfind(magic)
+            while i >= 0:
+                footer = BlockReader._readfooter(r, start + i + len(magic))
+                if footer is not None:
+                    return start + i + len(magic), footer
+                i = chunk.rfind(magic, 0, i + len(magic) - 1)
+            pos = start
+        return None, None
+
+    @staticmethod
+    def _scanblocks(r, start, codec):
+        import zlib
+        import lzma
+
+        r.seek(start)
+        data = r.read()
+
+        # Compressed blocks are self-delimiting, decompress them one after another until the data ends or breaks off
+        entries = []
+        pos = 0
+        while pos < len(data):
+            if codec is None:
+                if data.startswith(b'\x1f\x8b', pos):
+                    codec = 'gzip'
+                elif data.startswith(b'\xfd7zXZ\x00', pos):
+                    codec = 'lzma'
+                else:
+                    break
+            decompressor = zlib.decompressobj(31) if codec == 'gzip' else lzma.LZMADecompressor()
+            try:
+                lines = decompressor.decompress(data[pos:]).decode('utf-8').split('\n')
+                first = json.loads(lines[0]).get('timestamp', '')
+            except (zlib.error, lzma.LZMAError, ValueError):
+                break
+            if not decompressor.eof:
+                break
+            length = len(data) - pos - len(decompressor.unused_data)
+            entries.append([start + pos, length, first, len(lines)])
+            pos += length
+
+        return codec, entries, start + pos
+
+    @staticmethod
+    def _decompress(data, codec):
+        if codec == 'gzip':
+            import gzip
+            return gzip.decompress(data)
+        else:
+            import lzma
+            return lzma.decompress(data)
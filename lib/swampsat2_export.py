@@ -0,0 +1,295 @@
+# MIT License
+#
+# Copyright (c) 2020 Ralen Toledo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Merging, downsampling and pass summaries of parsed data (merge, export and passes commands)
+
+from collections import OrderedDict
+import os
+
+from swampsat2 import _timestampseconds
+
+
+def mergestreams(streams):
+    import heapq
+
+    # Tag every record with the station it came from
+    def _tag(station, records):
+        for record in records:
+            record['station'] = station
+            yield record
+
+    # Stations may log in different time zones, so records are ordered by UTC time
+    zones = set()
+
+    def _key(record):
+        timestamp = record.get('timestamp', '')
+        return _timestampseconds(timestamp, zones) if len(timestamp) >= 19 else float('-inf')
+
+    # Lazily merge the (already time ordered) streams, only one record per stream is held in memory
+    return heapq.merge(*[_tag(station, records) for station, records in streams], key=_key)
+
+
+def _numericfields(record):
+
+    # Telemetry values only (the bit flags and counters are included, the header fields are not)
+    return [key for key, value in record.items()
+            if key not in ('msgtype', 'messagenum', 'messagetotal') and type(value) in (int, float)]
+
+
+def bucketize(records, width, fields=None):
+    import time
+
+    if width <= 0:
+        raise ValueError('Bucket width must be a positive number of seconds, got %s' % width)
+
+    # Statistics of the current bucket for each field: [min, max, sum, count]
+    current = None
+    stats = OrderedDict()
+    zones = set()
+
+    # One row per field of a bucket (buckets are in UTC)
+    def _rows():
+        timestamp = time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(current))
+        for field, (low, high, total, count) in stats.items():
+            yield OrderedDict([('timestamp', timestamp), ('field', field), ('min', low), ('max', high),
+                               ('mean', total / count), ('count', count)])
+
+    for record in records:
+        timestamp = record.get('timestamp', '')
+        names = _numericfields(record) if fields is None else [field for field in fields if field in record]
+        if len(timestamp) < 19 or len(names) == 0:
+            continue
+
+        # Records are in time order, so a bucket is complete as soon as a record falls outside of it
+        seconds = _timestampseconds(timestamp, zones)
+        start = seconds - seconds % width
+        if start != current:
+            if current is not None:
+                for row in _rows():
+                    yield row
+            current = start
+            stats = OrderedDict()
+
+        for field in names:
+            value = record[field]
+            entry = stats.get(field)
+            if entry is None:
+                stats[field] = [value, value, value, 1]
+            else:
+                if value < entry[0]:
+                    entry[0] = value
+                if value > entry[1]:
+                    entry[1] = value
+                entry[2] += value
+                entry[3] += 1
+
+    if current is not None:
+        for row in _rows():
+            yield row
+
+
+def lttb(x, y, threshold):
+
+    # Largest-Triangle-Three-Buckets: keep the first and last points and, from each bucket in between, the point
+    # forming the largest triangle with the previously kept point and the average of the next bucket
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    every = (n - 2) / (threshold - 2)
+    kept = [0]
+    a = 0
+    for i in range(threshold - 2):
+
+        # Average of the next bucket
+        nextstart = int((i + 1) * every) + 1
+        nextend = min(int((i + 2) * every) + 1, n)
+        avgx = sum(x[nextstart:nextend]) / (nextend - nextstart)
+        avgy = sum(y[nextstart:nextend]) / (nextend - nextstart)
+
+        # Point of this bucket with the largest triangle area
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        ax, ay = x[a], y[a]
+        best, bestarea = start, -1.0
+        for j in range(start, end):
+            area = abs((ax - avgx) * (y[j] - ay) - (ax - x[j]) * (avgy - ay))
+            if area > bestarea:
+                best, bestarea = j, area
+
+        kept.append(best)
+        a = best
+
+    kept.append(n - 1)
+    return kept
+
+
+def downsample(records, threshold, fields=None):
+    from array import array
+
+    # The first and last points are always kept, so fewer than three points can't show a trend
+    if threshold < 3:
+        raise ValueError('Number of points must be at least 3, got %s' % threshold)
+
+    # Collect the series of every field in one pass: one shared column of times (UTC seconds) and timestamps, and a
+    # value column per field with NaN where a record doesn't have the field
+    nan = float('nan')
+    times = array('d')
+    stamps = []
+    series = OrderedDict()
+    zones = set()
+    for record in records:
+        timestamp = record.get('timestamp', '')
+        names = _numericfields(record) if fields is None else [field for field in fields if field in record]
+        if len(timestamp) < 19 or len(names) == 0:
+            continue
+
+        row = len(times)
+        times.append(_timestampseconds(timestamp, zones))
+        stamps.append(timestamp)
+        for field in names:
+            y = series.get(field)
+            if y is None:
+                y = series[field] = array('d')
+            if len(y) < row:
+                y.extend(array('d', [nan]) * (row - len(y)))
+            y.append(record[field])
+
+    # Reduce each series to the requested number of points, only the rows of a field that has gaps are copied
+    for field, y in series.items():
+        if len(y) == len(times) and not any(value != value for value in y):
+            rows = None
+            x = times
+        else:
+            rows = [i for i, value in enumerate(y) if value == value]
+            x = array('d', [times[i] for i in rows])
+            y = array('d', [y[i] for i in rows])
+        for i in lttb(x, y, threshold):
+            yield OrderedDict([('field', field), ('timestamp', stamps[i if rows is None else rows[i]]), ('value', y[i])])
+
+
+def segmentpasses(records, gap=600):
+
+    # Beacons arrive in bursts, one per ground station pass, so a pass ends when no beacon is received for a while
+    current = []
+    last = None
+    zones = set()
+    for record in records:
+        timestamp = record.get('timestamp', '')
+        if len(timestamp) < 19:
+            continue
+
+        seconds = _timestampseconds(timestamp, zones)
+        if last is not None and seconds - last > gap:
+            yield current
+            current = []
+        current.append(record)
+        last = seconds
+
+    if len(current) > 0:
+        yield current
+
+
+# Key EPS and battery values of a pass summary
+_passfields = ('battery_voltage', 'battery_current', 'battery_temperature_motherboard',
+               'eps_output_voltage_bat', 'eps_output_current_bat', 'eps_output_voltage_bcr', 'eps_output_current_bcr',
+               'eps_temperature_motherboard', 'eps_temperature_daughterboard')
+
+
+def summarizepass(records):
+    keyfields = _passfields
+
+    summary = OrderedDict()
+    summary['first'] = records[0]['timestamp']
+    summary['last'] = records[-1]['timestamp']
+    summary['duration'] = _timestampseconds(records[-1]['timestamp']) - _timestampseconds(records[0]['timestamp'])
+    summary['beacons'] = len(records)
+    for msgtype in (0, 3, 4):
+        summary['msgtype_' + str(msgtype)] = sum(1 for record in records if record.get('msgtype') == msgtype)
+
+    # Stations that received the pass (merged logs only)
+    stations = sorted(set(record['station'] for record in records if 'station' in record))
+    if len(stations) > 0:
+        summary['stations'] = stations
+
+    telemetry = [record for record in records if record.get('msgtype') in (3, 4)]
+    for field in keyfields:
+        values = [record[field] for record in telemetry if field in record]
+        summary[field + '_min'] = min(values) if len(values) > 0 else None
+        summary[field + '_max'] = max(values) if len(values) > 0 else None
+
+    # Resets counted during the pass
+    if len(telemetry) > 0:
+        for field in telemetry[0]:
+            if field.startswith('eps_reset_'):
+                summary[field + '_delta'] = telemetry[-1][field] - telemetry[0][field]
+
+    return summary
+
+
+def _slimpass(records):
+
+    # Only the fields a summary uses are sent to a worker process
+    keep = {'timestamp', 'msgtype', 'station'}.union(_passfields)
+    return [{key: value for key, value in record.items() if key in keep or key.startswith('eps_reset_')} for record in records]
+
+
+def _summarizebatch(batch):
+    return [summarizepass(records) for records in batch]
+
+
+def summarizepasses(records, gap=600, workers=None, batchsize=256):
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    passes = segmentpasses(records, gap)
+
+    # Summarize in this process (also when there is only one CPU to use)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1:
+        for beacons in passes:
+            yield summarizepass(beacons)
+        return
+
+    # Summarize independent passes in worker processes, many passes per task and only the fields a summary needs,
+    # keeping a bounded number of tasks in flight
+    def _batches():
+        batch, size = [], 0
+        for beacons in passes:
+            batch.append(_slimpass(beacons))
+            size += len(beacons)
+            if size >= batchsize:
+                yield batch
+                batch, size = [], 0
+        if len(batch) > 0:
+            yield batch
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for batch in _batches():
+            pending.append(executor.submit(_summarizebatch, batch))
+            if len(pending) >= 2 * workers:
+                for summary in pending.popleft().result():
+                    yield summary
+        while len(pending) > 0:
+            for summary in pending.popleft().result():
+                yield summary
@@ -0,0 +1,185 @@
+# MIT License
+#
+# Copyright (c) 2020 Ralen Toledo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# Local HTTP decode service (serve command)
+
+import json
+
+from swampsat2 import ParseDownlink, _assembleimage
+
+
+def serve(host='127.0.0.1', port=8020, workers=None, cache=None, timeout=30):
+    from concurrent.futures import ThreadPoolExecutor
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    import threading
+
+    class _PooledHTTPServer(ThreadingHTTPServer):
+
+        # Every connection has its own thread, the decoding itself runs on a fixed size pool of worker threads
+        daemon_threads = True
+
+        def __init__(self, address, handler):
+            super().__init__(address, handler)
+            self.pool = ThreadPoolExecutor(workers)
+            self.images = {}
+            self.imagelock = threading.Lock()
+
+        def server_close(self):
+            super().server_close()
+            self.pool.shutdown(wait=False)
+
+    # Decode one beacon into a response body and status
+    def _decode(hexstr):
+        try:
+            obj = ParseDownlink(hexstr, cache=cache)
+        except ValueError as exc:
+            return 422, {'error': 'decodefailed', 'message': str(exc)}
+        if obj.error is not None:
+            return 422, {'error': obj.error.reason, 'message': obj.error.message}
+        return 200, obj.compileddata
+
+    def _decodebatch(hexstrs):
+        return [_decode(hexstr)[1] for hexstr in hexstrs]
+
+    # Raw frames of a batch, each preceded by its length (2 bytes, big endian), None if the body is cut short
+    def _splitframes(body):
+        hexstrs = []
+        pos = 0
+        while pos < len(body):
+            if pos + 2 > len(body):
+                return None
+            length = int.from_bytes(body[pos:pos + 2], 'big')
+            if pos + 2 + length > len(body):
+                return None
+            hexstrs.append(body[pos + 2:pos + 2 + length].hex())
+            pos += 2 + length
+        return hexstrs
+
+    idletimeout = timeout
+
+    class _DecodeHandler(BaseHTTPRequestHandler):
+
+        # Keep connections open between requests, and send small responses without waiting on Nagle's algorithm
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        # Idle connections are closed after this many seconds
+        timeout = idletimeout
+
+        def do_POST(self):
+            try:
+                self._post()
+            except Exception as exc:
+                self._send(500, {'error': 'internal', 'message': '%s: %s' % (type(exc).__name__, exc)})
+
+        def _post(self):
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+            except ValueError:
+                self._send(400, {'error': 'badrequest', 'message': 'Invalid Content-Length'})
+                return
+            body = self.rfile.read(length)
+            israw = self.headers.get('Content-Type', '').startswith('application/octet-stream')
+
+            # Single beacon (hex text or raw bytes)
+            if self.path == '/decode':
+                hexstr = body.hex() if israw else body.decode('utf-8', 'replace')
+                status, payload = self.server.pool.submit(_decode, hexstr).result()
+                self._send(status, payload)
+
+            # Several beacons (a JSON list of hex strings, one hex string per line, or length prefixed raw frames)
+            elif self.path == '/decode/batch':
+                if israw:
+                    hexstrs = _splitframes(body)
+                    if hexstrs is None:
+                        self._send(400, {'error': 'badrequest', 'message': 'Body is not a sequence of length prefixed frames'})
+                        return
+                else:
+                    text = body.decode('utf-8', 'replace')
+                    try:
+                        hexstrs = json.loads(text) if text.lstrip().startswith('[') else text.splitlines()
+                    except ValueError:
+                        hexstrs = None
+                    if not isinstance(hexstrs, list) or not all(isinstance(hexstr, str) for hexstr in hexstrs):
+                        self._send(400, {'error': 'badrequest', 'message': 'Body is not a JSON list of hex strings'})
+                        return
+                self._send(200, self.server.pool.submit(_decodebatch, hexstrs).result())
+
+            # Image data packets (raw bytes of one packet or one hex packet per line)
+            elif self.path.startswith('/image/'):
+                packets = [body.hex()] if israw else [line.strip().replace(' ', '').lower()
+                                                       for line in body.decode('utf-8', 'replace').splitlines()]
+                with self.server.imagelock:
+                    chunks = self.server.images.setdefault(self.path[len('/image/'):], [])
+                    chunks.extend(packet for packet in packets if packet != '')
+                    self._send(200, {'chunks': len(chunks)})
+
+            else:
+                self._send(404, {'error': 'notfound', 'message': 'Unknown path'})
+
+        def do_GET(self):
+
+            # Assemble the image from the submitted packets
+            if self.path.startswith('/image/'):
+                with self.server.imagelock:
+                    chunks = list(self.server.images.get(self.path[len('/image/'):], []))
+                try:
+                    image = self.server.pool.submit(_assembleimage, chunks).result() if len(chunks) > 0 else None
+                except Exception as exc:
+                    self._send(500, {'error': 'internal', 'message': '%s: %s' % (type(exc).__name__, exc)})
+                    return
+                if image is None or image[1] >= image[2]:
+                    self._send(404, {'error': 'noimage', 'message': 'No image data found'})
+                else:
+                    self._send(200, bytes(image[0]), 'image/jpeg', {'X-Missing-Packets': str(image[1])})
+            else:
+                self._send(404, {'error': 'notfound', 'message': 'Unknown path'})
+
+        def do_DELETE(self):
+            if self.path.startswith('/image/'):
+                with self.server.imagelock:
+                    self.server.images.pop(self.path[len('/image/'):], None)
+                self._send(200, {})
+            else:
+                self._send(404, {'error': 'notfound', 'message': 'Unknown path'})
+
+        def _send(self, status, payload, contenttype='application/json', headers=None):
+            if contenttype == 'application/json':
+                payload = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', contenttype)
+            self.send_header('Content-Length', str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+
+            # No output per request
+            pass
+
+    server = _PooledHTTPServer((host, port), _DecodeHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,122 @@
+# MIT License
+#
+# Copyright (c) 2020 Ralen Toledo
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+# SQLite database of parsed data, one table per message type (--sqlite)
+
+import json
+import os
+
+from swampsat2 import _beaconfields
+
+
+class SqliteSink:
+
+    # Table for each message type
+    tables = {0: 'acknowledgement', 3: 'beacon3', 4: 'beacon4'}
+
+    def __init__(self, path, batchsize=5000):
+        import sqlite3
+
+        self.path = os.path.normcase(path)
+        self.batchsize = batchsize
+        self._pending = {msgtype: [] for msgtype in SqliteSink.tables}
+        self._count = 0
+
+        # Create path directory tree if it doesn't already exist
+        try:
+            os.makedirs(os.path.split(self.path)[0], exist_ok=True)
+        except OSError:
+            pass
+
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+
+        # Typed columns from the decoded fields of each message type
+        sqltypes = {int: 'INTEGER', float: 'REAL', str: 'TEXT'}
+        self._columns = {}
+        self._columnsets = {}
+        for msgtype, table in SqliteSink.tables.items():
+            if msgtype == 0:
+                fields = [('timestamp', str), ('msgtype', int), ('messagenum', int), ('messagetotal', int), ('message', str)]
+            else:
+                fields = list(_beaconfields(msgtype).items())
+            fields += [('station', str), ('extra', str)]
+            self._columns[msgtype] = [field for field, _ in fields]
+            self._columnsets[msgtype] = frozenset(self._columns[msgtype])
+
+            with self._conn:
+                self._conn.execute('CREATE TABLE IF NOT EXISTS %s (id INTEGER PRIMARY KEY, %s)' % (
+                    table, ', '.join('%s %s' % (field, sqltypes[ftype]) for field, ftype in fields)))
+                self._conn.execute('CREATE INDEX IF NOT EXISTS %s_timestamp ON %s (timestamp)' % (table, table))
+
+                # Every table holds a single message type, so an index on it only slows down inserts
+                self._conn.execute('DROP INDEX IF EXISTS %s_msgtype' % table)
+
+        # Messages of every type in one view, each part uses the timestamp index of its table
+        with self._conn:
+            self._conn.execute('CREATE VIEW IF NOT EXISTS messages AS %s' % ' UNION ALL '.join(
+                'SELECT timestamp, msgtype, station, id FROM %s' % table for table in SqliteSink.tables.values()))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def write(self, record):
+        msgtype = record.get('msgtype')
+        columns = self._columns.get(msgtype)
+        if columns is None:
+            return
+
+        # Anything without a column of its own (e.g. alarms) is kept as JSON
+        columnset = self._columnsets[msgtype]
+        extra = {key: value for key, value in record.items() if key not in columnset}
+        row = [record.get(column) for column in columns[:-1]]
+        row.append(json.dumps(extra, separators=(',', ':')) if len(extra) > 0 else None)
+
+        self._pending[msgtype].append(row)
+        self._count += 1
+        if self._count >= self.batchsize:
+            self.flush()
+
+    def flush(self):
+        if self._count == 0:
+            return
+
+        # One transaction per batch
+        with self._conn:
+            for msgtype, rows in self._pending.items():
+                if len(rows) > 0:
+                    columns = self._columns[msgtype]
+                    self._conn.executemany('INSERT INTO %s (%s) VALUES (%s)' % (
+                        SqliteSink.tables[msgtype], ', '.join(columns), ', '.join('?' * len(columns))), rows)
+                    self._pending[msgtype] = []
+        self._count = 0
+
+    def close(self):
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
@@ -4,6 +4,8 @@ setup(
     version='1.1.2',
     packages=find_packages("lib"),
     package_dir={'': 'lib'},
+    py_modules=['swampsat2', 'swampsat2_archive', 'swampsat2_blocks', 'swampsat2_export', 'swampsat2_serve',
+                'swampsat2_sqlite'],
     url='http://github.com/ralent/swampsat2',
     license='MIT',
     author='Ralen Toledo',
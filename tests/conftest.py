@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The parser and its submodules are in lib/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lib'))
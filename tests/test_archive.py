@@ -0,0 +1,132 @@
+import os
+import random
+import subprocess
+import sys
+import time
+
+import pytest
+
+import swampsat2
+import swampsat2_archive
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _beacons():
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0] + \
+        swampsat2._readkss(os.path.join(SAMPLES, 'sample_ss2_beacon_kss_file.kss'))[0]
+    return [swampsat2.ParseDownlink(packet) for packet in packets if swampsat2.ParseDownlink(packet).error is None]
+
+
+@pytest.mark.parametrize('blocksize', [1, 7, 4096])
+def test_round_trip(tmp_path, blocksize):
+    beacons = _beacons()
+    rng = random.Random(1)
+    path = str(tmp_path / 'beacons.ss2arc')
+
+    # Payloads from the decoder and hex strings, across two writers and several time zones
+    written = []
+    for part in range(2):
+        with swampsat2.ArchiveWriter(path, blocksize) as archive:
+            for i in range(300):
+                obj = rng.choice(beacons)
+                timestamp = time.strftime('%Y-%m-%d %H:%M:%S ', time.gmtime(1580778000 + 300 * part + i)) + rng.choice(['UTC', 'EST'])
+                if i % 2:
+                    archive.write(timestamp, obj.raw, msgtype=obj.compileddata['msgtype'])
+                else:
+                    archive.write(timestamp, ' '.join(obj.raw.hex()[j:j + 2] for j in range(0, len(obj.raw) * 2, 2)))
+                written.append((timestamp, obj))
+
+    records = list(swampsat2.ArchiveReader(path).records())
+    assert len(records) == len(written)
+    for record, (timestamp, obj) in zip(records, written):
+        assert record['timestamp'] == timestamp
+        expected = dict(obj.compileddata, timestamp=timestamp)
+        assert record == expected
+
+
+def test_invalid_payload(tmp_path):
+    with swampsat2.ArchiveWriter(str(tmp_path / 'beacons.ss2arc')) as archive:
+        with pytest.raises(swampsat2.DecodeError):
+            archive.write('2020-02-04 01:00:00 UTC', '0102')
+
+
+def test_pack_column_round_trip():
+    rng = random.Random(2)
+    for width in (1, 5, 8, 13, 16, 17):
+        for count in (1, 2, 8, 9, 100):
+            values = [rng.getrandbits(width) for _ in range(count)]
+            buf = bytearray()
+            swampsat2_archive._packcolumn(buf, values)
+            buf += b'\xff'
+            unpacked, pos = swampsat2_archive._unpackcolumn(bytes(buf), 0, count)
+            assert unpacked == values and buf[pos:] == b'\xff'
+
+
+def test_odd_length_beacons(tmp_path):
+    acknowledgement = swampsat2.ParseDownlink.acknowledgement + '1'
+
+    # A trailing half byte is decoded as before, there are just no raw bytes to archive
+    beacon = swampsat2.ParseDownlink('0' * 325)
+    assert beacon.error is None and beacon.compileddata['msgtype'] == 3 and beacon.raw == b''
+    beacon = swampsat2.ParseDownlink(acknowledgement)
+    assert beacon.error is None and beacon.compileddata['msgtype'] == 0 and beacon.raw == b''
+
+    cache = swampsat2.DecodeCache()
+    for _ in range(2):
+        assert swampsat2.ParseDownlink('0' * 325, cache=cache).compileddata['msgtype'] == 3
+    assert cache.hits == 1
+
+    with swampsat2.ArchiveWriter(str(tmp_path / 'beacons.ss2arc')) as archive:
+        archive.write('2020-02-04 01:00:00 UTC', acknowledgement)
+        with pytest.raises(swampsat2.DecodeError):
+            archive.write('2020-02-04 01:00:01 UTC', '0' * 325)
+        with pytest.raises(swampsat2.DecodeError):
+            archive.write('2020-02-04 01:00:02 UTC', b'', msgtype=3)
+    assert [record['msgtype'] for record in swampsat2.ArchiveReader(str(tmp_path / 'beacons.ss2arc')).records()] == [0]
+
+
+def test_odd_length_file(tmp_path):
+    fpath = tmp_path / 'odd.txt'
+    fpath.write_text('0' * 325 + '\n' + swampsat2.ParseDownlink.acknowledgement + '1\n' + _beacons()[0].raw.hex() + '\n')
+    archivepath = str(tmp_path / 'beacons.ss2arc')
+
+    result = subprocess.run([sys.executable, swampsat2.__file__, '-f', str(fpath), '-l', str(tmp_path / 'log.json'),
+                             '-t', 'txt', '--archive=' + archivepath],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+    assert 'Successfully read: 3 lines' in result.stdout
+    assert len(list(swampsat2.ArchiveReader(archivepath).payloads())) == 2
+
+
+@pytest.mark.parametrize('cut', [1, 100, 1000])
+def test_interrupted_write(tmp_path, cut):
+    beacons = _beacons()
+    path = str(tmp_path / 'beacons.ss2arc')
+
+    def _write(start, count):
+        with swampsat2.ArchiveWriter(path, 10) as archive:
+            for i in range(start, start + count):
+                obj = beacons[i % len(beacons)]
+                archive.write('2020-02-04 01:%02d:%02d UTC' % divmod(i, 60), obj.raw, msgtype=obj.compileddata['msgtype'])
+
+    # Cut into the last of three blocks, as a write interrupted part way would
+    _write(0, 30)
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - cut)
+    assert len(list(swampsat2.ArchiveReader(path).payloads())) == (20 if cut < 1000 else 10)
+
+    # The next run replaces the broken block
+    _write(30, 10)
+    timestamps = [timestamp for timestamp, _ in swampsat2.ArchiveReader(path).payloads()]
+    kept = 20 if cut < 1000 else 10
+    assert timestamps == ['2020-02-04 01:%02d:%02d UTC' % divmod(i, 60) for i in list(range(kept)) + list(range(30, 40))]
+
+
+def test_not_an_archive(tmp_path):
+    path = tmp_path / 'beacons.ss2arc'
+    path.write_bytes(b'not an archive')
+    obj = _beacons()[0]
+    with pytest.raises(IOError):
+        with swampsat2.ArchiveWriter(str(path)) as archive:
+            archive.write('2020-02-04 01:00:00 UTC', obj.raw, msgtype=obj.compileddata['msgtype'])
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+
+import swampsat2
+
+
+def _records(n, start=0):
+    return [{'timestamp': '2020-02-04 01:%02d:%02d UTC' % divmod(i, 60), 'msgtype': 4, 'battery_voltage': 7.5 + i / 1000}
+            for i in range(start, start + n)]
+
+
+@pytest.mark.parametrize('codec', ['gzip', 'lzma'])
+def test_append_and_read(tmp_path, codec):
+    path = str(tmp_path / 'log.ss2blk')
+    for start in (0, 100, 200):
+        with swampsat2.BlockWriter(path, codec, blocksize=30) as writer:
+            for record in _records(100, start):
+                writer.write(record)
+
+    reader = swampsat2.BlockReader(path)
+    assert list(reader.records()) == _records(300)
+    assert len(reader) == 300
+    assert list(reader.records('2020-02-04 01:02:00', '2020-02-04 01:02:09')) == _records(10, 120)
+
+
+def test_interrupted_append_keeps_file_readable(tmp_path):
+    path = str(tmp_path / 'log.ss2blk')
+    with swampsat2.BlockWriter(path, blocksize=50) as writer:
+        for record in _records(100):
+            writer.write(record)
+
+    # The run stops without close(): the blocks written so far are recovered, the old ones are kept
+    writer = swampsat2.BlockWriter(path, blocksize=50)
+    for record in _records(150, 100):
+        writer.write(record)
+    writer._file.close()
+    assert list(swampsat2.BlockReader(path).records()) == _records(250)
+
+    # A partly written block is dropped and the next run carries on
+    with open(path, 'ab') as w:
+        w.write(b'\x1f\x8b\x08\x00broken')
+    with swampsat2.BlockWriter(path, blocksize=50) as writer:
+        for record in _records(50, 250):
+            writer.write(record)
+    assert list(swampsat2.BlockReader(path).records()) == _records(300)
+
+
+def test_footer_is_not_rewritten(tmp_path):
+    path = str(tmp_path / 'log.ss2blk')
+
+    # One record per run (as a per-frame hook does) only adds a small footer each time
+    sizes = []
+    for record in _records(40):
+        with swampsat2.BlockWriter(path) as writer:
+            writer.write(record)
+        sizes.append(os.path.getsize(path))
+    steps = [b - a for a, b in zip(sizes, sizes[1:])]
+    assert max(steps) - min(steps) < 16
+    assert list(swampsat2.BlockReader(path).records()) == _records(40)
+
+
+def test_not_a_block_file(tmp_path):
+    path = str(tmp_path / 'log.json')
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sample_ss2_beacon_kss_file.kss'), path)
+    with pytest.raises(IOError):
+        swampsat2.BlockReader(path)
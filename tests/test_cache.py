@@ -0,0 +1,90 @@
+import os
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _packets():
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    return [packet for packet in packets if swampsat2.ParseDownlink(packet).error is None]
+
+
+def _beacon():
+    return next(packet for packet in _packets() if swampsat2.ParseDownlink(packet).compileddata['msgtype'] == 4)
+
+
+def test_counters():
+    beacon = _beacon()
+    cache = swampsat2.DecodeCache()
+
+    # Payloads are matched after cleaning, so spacing and case don't matter
+    swampsat2.ParseDownlink(beacon, cache=cache)
+    swampsat2.ParseDownlink(' '.join(beacon[i:i + 2].upper() for i in range(0, len(beacon), 2)), cache=cache)
+    swampsat2.ParseDownlink(beacon, cache=cache)
+    assert (cache.hits, cache.misses, len(cache)) == (2, 1, 1)
+
+    # Lines that don't decode are not cached
+    for _ in range(2):
+        assert swampsat2.ParseDownlink('0102', cache=cache).error.reason == 'length'
+    assert (cache.hits, cache.misses, len(cache)) == (2, 3, 1)
+
+    cache.clear()
+    assert (cache.hits, cache.misses, len(cache)) == (0, 0, 0)
+
+
+def test_eviction():
+    cache = swampsat2.DecodeCache(2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+
+    # "b" is now the least recently used entry
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_eviction_while_decoding():
+    packets = sorted(set(_packets()))
+    cache = swampsat2.DecodeCache(2)
+    for packet in packets[:3]:
+        swampsat2.ParseDownlink(packet, cache=cache)
+    assert len(cache) == 2
+    swampsat2.ParseDownlink(packets[0], cache=cache)
+    assert (cache.hits, cache.misses) == (0, 4)
+    swampsat2.ParseDownlink(packets[2], cache=cache)
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+def test_hit_is_a_fresh_copy():
+    beacon = _beacon()
+    cache = swampsat2.DecodeCache()
+    first = swampsat2.ParseDownlink(beacon, cache=cache).compileddata
+    key = swampsat2.ParseDownlink._normalize(beacon, '')
+
+    # Pretend the first copy was received a while ago
+    cache.get(key)['timestamp'] = '2020-02-04 01:00:00 UTC'
+    limits = swampsat2.LimitChecker({'battery_voltage': {'red': [0, 1]}})
+    hit = swampsat2.ParseDownlink(beacon, limits=limits, cache=cache).compileddata
+    assert hit['timestamp'] != '2020-02-04 01:00:00 UTC'
+    assert hit['timestamp'][:4] == first['timestamp'][:4]
+
+    # Changing the result (e.g. adding the alarms) leaves the cached beacon alone
+    hit['battery_voltage'] = -1.0
+    cached = cache.get(key)
+    assert cached is not hit
+    assert 'alarms' not in cached and cached['battery_voltage'] == first['battery_voltage']
+    assert dict(cached, timestamp=first['timestamp']) == first
+
+
+def test_size_zero():
+    beacon = _packets()[0]
+    cache = swampsat2.DecodeCache(0)
+    for _ in range(3):
+        assert swampsat2.ParseDownlink(beacon, cache=cache).error is None
+    cache.put('a', 1)
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (0, 3)
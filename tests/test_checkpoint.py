@@ -0,0 +1,67 @@
+import os
+import shutil
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _decoded(packets):
+    return [packet for packet in packets if swampsat2.ParseDownlink(packet).error is None]
+
+
+def _read(fpath, checkpoint):
+    offset = checkpoint.resume(fpath)
+    if offset is None:
+        return None
+    packets, consumed = swampsat2._readputtylog(fpath, offset, not checkpoint.settled(fpath))
+    checkpoint.update(fpath, consumed)
+    checkpoint.save()
+    return packets
+
+
+def test_finished_file_without_final_newline(tmp_path):
+    fpath = str(tmp_path / 'capture.txt')
+    with open(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'), 'rb') as r:
+        data = r.read().rstrip(b'\r\n')
+    with open(fpath, 'wb') as w:
+        w.write(data)
+    expected = _decoded(swampsat2._readputtylog(fpath)[0])
+
+    # The first run leaves the unterminated last line, the next run reads it because the file stopped growing
+    manifest = str(tmp_path / 'manifest.json')
+    first = _read(fpath, swampsat2.Checkpoint(manifest))
+    second = _read(fpath, swampsat2.Checkpoint(manifest))
+    assert _decoded(first) + _decoded(second) == expected
+    assert len(_decoded(second)) == 1
+
+    # Only now is the file unchanged
+    assert _read(fpath, swampsat2.Checkpoint(manifest)) is None
+
+
+def test_appended_file_resumes(tmp_path):
+    fpath = str(tmp_path / 'capture.txt')
+    sample = os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt')
+    with open(sample, 'rb') as r:
+        data = r.read()
+    half = data.rfind(b'\n', 0, len(data) // 2) + 1
+    with open(fpath, 'wb') as w:
+        w.write(data[:half])
+
+    manifest = str(tmp_path / 'manifest.json')
+    first = _read(fpath, swampsat2.Checkpoint(manifest))
+    with open(fpath, 'ab') as w:
+        w.write(data[half:])
+    second = _read(fpath, swampsat2.Checkpoint(manifest))
+    assert first + second == swampsat2._readputtylog(sample)[0]
+
+
+def test_kss_packet_at_end_of_file(tmp_path):
+    fpath = str(tmp_path / 'capture.kss')
+    shutil.copy(os.path.join(SAMPLES, 'sample_ss2_beacon_kss_file.kss'), fpath)
+    with open(fpath, 'ab') as w:
+        w.write(b'   1 > 01 02 03')
+
+    # A growing file leaves the unfinished packet, a finished file reads it
+    assert swampsat2._readkss(fpath, 0, True)[0] == swampsat2._readkss(fpath)[0][:-1]
+    assert swampsat2._readkss(fpath)[0][-1] == '010203'
@@ -0,0 +1,94 @@
+import os
+import subprocess
+import sys
+
+from docopt import docopt, DocoptExit
+import pytest
+
+import swampsat2
+
+LIB = os.path.dirname(os.path.abspath(swampsat2.__file__))
+SAMPLES = os.path.dirname(LIB)
+
+# Modules only some commands need, none of them should be imported to decode a hex string
+DEFERRED = ('docopt', 'sqlite3', 'http.server', 'concurrent.futures', 'gzip', 'lzma', 'statistics', 'csv',
+            'swampsat2_archive', 'swampsat2_blocks', 'swampsat2_export', 'swampsat2_serve', 'swampsat2_sqlite')
+
+# Cumulative import time of the module (bytecode cached), in microseconds
+BUDGET = 50000
+
+
+def _hexstring():
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    return next(packet for packet in packets if swampsat2.ParseDownlink(packet).error is None)
+
+
+def _importtimes(args):
+    env = dict(os.environ, PYTHONPATH=LIB)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env, cwd=SAMPLES,
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+
+    # "import time: self [us] | cumulative | imported package" lines, nested imports are indented
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and not line.endswith('imported package'):
+            _, cumulative, name = line[len('import time:'):].split('|')
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize('argv', [
+    ['-s', 'HEX'],
+    ['--hexstring', 'HEX'],
+    ['--hexstring=HEX'],
+    ['-s', '14 00 94 03'],
+    ['-l', 'log.json', '-s', 'HEX'],
+    ['-s', 'HEX', '--logfile=log.json', '-d', ':'],
+    ['--delimiter', ',', '--verbose', '-s', 'HEX'],
+    ['-v', '--delimiter=,', '--logfile', 'log.json', '--hexstring', 'HEX'],
+])
+def test_quick_options_match_docopt(argv):
+    assert swampsat2._quickoptions(argv) == docopt(swampsat2.__doc__, argv)
+
+
+@pytest.mark.parametrize('argv', [
+    ['-s', 'HEX', '-s', 'HEX'],
+    ['-s', 'HEX', '--hexstring=HEX'],
+    ['-l', 'a.json', '-s', 'HEX', '--logfile', 'b.json'],
+    ['-v', '-s', 'HEX', '--verbose'],
+])
+def test_quick_options_reject_repeated_options(argv):
+    assert swampsat2._quickoptions(argv) is None
+    with pytest.raises(DocoptExit):
+        docopt(swampsat2.__doc__, argv)
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['-l', 'log.json'],
+    ['-sHEX'],
+    ['-s'],
+    ['-s', 'HEX', '-f', 'beacons.txt'],
+    ['-s', 'HEX', '--cache=16'],
+    ['-i', '-s', 'HEX'],
+    ['passes', 'log.json'],
+    ['serve'],
+])
+def test_quick_options_leave_other_forms_to_docopt(argv):
+    assert swampsat2._quickoptions(argv) is None
+
+
+def test_import_budget():
+
+    # The first run writes the bytecode, the best of the others is measured
+    times = [_importtimes(['-c', 'import swampsat2']) for _ in range(4)][1:]
+    assert not [name for name in DEFERRED if name in times[0]]
+    assert min(run['swampsat2'] for run in times) < BUDGET
+
+
+def test_hexstring_run_defers_imports(tmp_path):
+    logpath = str(tmp_path / 'beacon.json')
+    times = _importtimes([os.path.join(LIB, 'swampsat2.py'), '-s', _hexstring(), '-l', logpath])
+    assert not [name for name in DEFERRED if name in times]
+    assert os.path.isfile(logpath)
@@ -0,0 +1,82 @@
+import os
+import threading
+
+import pytest
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _beacon():
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    return next(packet for packet in packets if swampsat2.ParseDownlink(packet).compileddata.get('msgtype') == 4)
+
+
+@pytest.mark.parametrize('hexstr, reason, message', [
+    ('', 'empty', 'String is empty'),
+    (' \t\r\n', 'empty', 'String is empty'),
+    ('01zz', 'invalidchar', 'Invalid character found in string'),
+    ('0102', 'length', 'Not a valid SS2 beacon'),
+    ('00' * 184, 'length', 'Not a valid SS2 beacon'),
+])
+def test_reasons(hexstr, reason, message):
+    obj = swampsat2.ParseDownlink(hexstr)
+    assert isinstance(obj.error, swampsat2.DecodeError) and isinstance(obj.error, ValueError)
+    assert (obj.error.reason, obj.error.message, str(obj.error)) == (reason, message, message)
+    assert obj.compileddata == {} and obj.raw == b''
+    assert obj._errmsg == '\t\t  ' + message
+
+    with pytest.raises(swampsat2.DecodeError) as excinfo:
+        swampsat2.ParseDownlink.decode(hexstr)
+    assert excinfo.value.reason == reason
+    assert swampsat2.ParseDownlink.parse(hexstr) == {}
+
+
+def test_decoded():
+    obj = swampsat2.ParseDownlink(_beacon())
+    assert obj.error is None and obj._errmsg == ''
+    assert swampsat2.ParseDownlink.decode(_beacon())['msgtype'] == 4
+
+
+def test_unknown_reason():
+    error = swampsat2.DecodeError('Something else')
+    assert (error.reason, error.message) == ('Something else', 'Something else')
+
+
+def test_stats():
+    stats = swampsat2.DecodeStats()
+    assert str(stats) == '0 decoded, 0 skipped'
+    for hexstr in [_beacon(), _beacon(), '', '01zz', '0102', '0304']:
+        swampsat2.ParseDownlink.parse(hexstr, stats=stats)
+    assert stats.decoded == 2
+    assert dict(stats.errors) == {'empty': 1, 'invalidchar': 1, 'length': 2}
+    assert str(stats) == '2 decoded, 4 skipped (empty: 1, invalidchar: 1, length: 2)'
+
+
+def test_stats_threads():
+    stats = swampsat2.DecodeStats()
+    error = swampsat2.DecodeError('length')
+
+    def _add():
+        for i in range(1000):
+            stats.add(None if i % 2 else error)
+
+    threads = [threading.Thread(target=_add) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (stats.decoded, stats.errors['length']) == (4000, 4000)
+
+
+def test_parserecord(tmp_path):
+    logpath = str(tmp_path / 'log.json')
+    stats = swampsat2.DecodeStats()
+
+    # Only decoded beacons are written to the log
+    assert swampsat2.ParseDownlink.parserecord('0102', logpath, stats=stats) == {}
+    assert not os.path.exists(logpath)
+    assert swampsat2.ParseDownlink.parserecord(_beacon(), logpath, stats=stats)['msgtype'] == 4
+    assert os.path.isfile(logpath)
+    assert str(stats) == '1 decoded, 1 skipped (length: 1)'
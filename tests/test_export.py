@@ -0,0 +1,57 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+import swampsat2
+
+
+def _records(n):
+    records = []
+    for i in range(n):
+        record = {'timestamp': '2020-02-04 01:%02d:%02d UTC' % divmod(i, 60), 'msgtype': 3 + i % 2, 'battery_voltage': 7 + (i % 7) / 10}
+        if i % 2:
+            record['stx_rf_poweroutput'] = float(i)
+        records.append(record)
+    return records
+
+
+def test_downsample_fields_with_gaps():
+    rows = list(swampsat2.downsample(_records(200), 10))
+    voltage = [row for row in rows if row['field'] == 'battery_voltage']
+    power = [row for row in rows if row['field'] == 'stx_rf_poweroutput']
+    assert len(voltage) == 10 and len(power) == 10
+
+    # Every point keeps the timestamp of the record it came from
+    assert power[0]['timestamp'] == '2020-02-04 01:00:01 UTC' and power[0]['value'] == 1.0
+    assert power[-1]['timestamp'] == '2020-02-04 01:03:19 UTC' and power[-1]['value'] == 199.0
+    assert all(int(row['timestamp'][-6:-4]) % 2 == 1 for row in power)
+
+
+def test_bucketize():
+    rows = list(swampsat2.bucketize(_records(120), 60, ['stx_rf_poweroutput']))
+    assert [(row['timestamp'], row['min'], row['max'], row['count']) for row in rows] == \
+        [('2020-02-04 01:00:00 UTC', 1, 59, 30), ('2020-02-04 01:01:00 UTC', 61, 119, 30)]
+
+
+@pytest.mark.parametrize('width', [0, -60])
+def test_bucketize_width(width):
+    with pytest.raises(ValueError):
+        list(swampsat2.bucketize(_records(10), width))
+
+
+@pytest.mark.parametrize('threshold', [2, 0, -1])
+def test_downsample_threshold(threshold):
+    with pytest.raises(ValueError):
+        list(swampsat2.downsample(_records(10), threshold))
+
+
+@pytest.mark.parametrize('option, message', [('--bucket=0', 'Bucket width'), ('--points=2', 'Number of points')])
+def test_export_options(tmp_path, option, message):
+    logpath = tmp_path / 'log.json'
+    logpath.write_text(''.join(json.dumps(record, indent=4) + '\n' for record in _records(10)))
+    result = subprocess.run([sys.executable, swampsat2.__file__, 'export', '-l', str(tmp_path / 'export.csv'), option, str(logpath)],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    assert result.returncode != 0 and message in result.stderr
+    assert not (tmp_path / 'export.csv').exists()
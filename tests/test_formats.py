@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CALLSIGNS = bytes.fromhex('AEA468AA8C40E0AE9664B092886103F0')
+
+
+def _payloads():
+    packets = swampsat2._readkss(os.path.join(SAMPLES, 'sample_ss2_beacon_kss_file.kss'))[0]
+    beacon = next(obj.raw for obj in map(swampsat2.ParseDownlink, packets) if obj.error is None and obj.compileddata['msgtype'] == 4)
+
+    # Frame end and frame escape bytes inside the payload have to be escaped in a KISS frame
+    beacon = bytearray(beacon)
+    beacon[10], beacon[20], beacon[21] = 0xc0, 0xdb, 0xdc
+    return [bytes(beacon), ('Gator Nation Is Everywhere! From SwampSat II').encode('utf-8')]
+
+
+def _kissframe(payload, command=0x00):
+    escaped = (CALLSIGNS + payload).replace(b'\xdb', b'\xdb\xdd').replace(b'\xc0', b'\xdb\xdc')
+    return b'\xc0' + bytes([command]) + escaped + b'\xc0'
+
+
+@pytest.mark.parametrize('fname, ftype', [
+    ('sample_ss2_beacon_kss_file.kss', '.kss'),
+    ('sample_ss2_beacon_txt_log_file.txt', '.log'),
+    ('sample_ss2image_kss_file.kss', '.kss'),
+])
+def test_sniff_samples(fname, ftype):
+    assert swampsat2._sniffformat(os.path.join(SAMPLES, fname)) == ftype
+
+
+def test_sniff_other_files(tmp_path):
+    payloads = _payloads()
+    files = {
+        'plain.hex': (payloads[0].hex().upper() + '\r\n').encode('utf-8') * 2,
+        'capture.kiss': _kissframe(payloads[0]) + _kissframe(payloads[1]),
+        'midframe.kiss': _kissframe(payloads[0])[20:] + _kissframe(payloads[1]),
+        'notes.txt': b'Nothing to decode here\n',
+    }
+    sniffed = {}
+    for fname, data in files.items():
+        (tmp_path / fname).write_bytes(data)
+        sniffed[fname] = swampsat2._sniffformat(str(tmp_path / fname))
+    assert sniffed == {'plain.hex': '.log', 'capture.kiss': '.kiss', 'midframe.kiss': '.kiss', 'notes.txt': None}
+
+
+def test_read_kiss(tmp_path):
+    payloads = _payloads()
+    path = tmp_path / 'capture.kiss'
+
+    # Data frames are kept (escapes undone, command byte and callsigns removed), other commands are dropped
+    path.write_bytes(_kissframe(payloads[0]) + _kissframe(b'\x01\x02', command=0x06) + b'\xc0\xc0' + _kissframe(payloads[1]))
+    packets, consumed = swampsat2._readkiss(str(path))
+    assert packets == [payload.hex() for payload in payloads]
+    assert consumed == os.path.getsize(str(path))
+    assert [swampsat2.ParseDownlink(packet).compileddata['msgtype'] for packet in packets] == [4, 0]
+    assert swampsat2.ParseDownlink(packets[0]).raw == payloads[0]
+
+    # A frame without its closing frame end is left for the next read of a file still being written (from just after its
+    # opening frame end)
+    complete = os.path.getsize(str(path))
+    with open(str(path), 'ab') as w:
+        w.write(_kissframe(payloads[0])[:-1])
+    assert swampsat2._readkiss(str(path), 0, True) == (packets, complete + 1)
+    assert swampsat2._readkiss(str(path), complete + 1, False) == ([payloads[0].hex()], os.path.getsize(str(path)))
+
+
+def test_directory_with_checkpoint(tmp_path):
+    folder = tmp_path / 'captures'
+    folder.mkdir()
+    shutil.copy(os.path.join(SAMPLES, 'sample_ss2_beacon_kss_file.kss'), str(folder / 'a_station.kss'))
+    shutil.copy(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'), str(folder / 'b_putty.dat'))
+    payloads = _payloads()
+    (folder / 'c_capture.bin').write_bytes(_kissframe(payloads[0]) + _kissframe(payloads[1]))
+    logpath = str(tmp_path / 'log.json')
+
+    def _run():
+        result = subprocess.run([sys.executable, swampsat2.__file__, '-f', str(folder), '-l', logpath,
+                                 '--checkpoint=' + str(tmp_path / 'checkpoint.json')],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    def _logged():
+        with open(logpath, 'rb') as r:
+            return [json.loads(text.decode('utf-8')) for _, _, text in swampsat2._scanjson(r)]
+
+    # Every file is read with the reader of its own format, whatever its extension
+    output = _run()
+    assert 'a_station.kss: 3 lines read' in output
+    assert 'b_putty.dat: 6 lines read' in output
+    assert 'c_capture.bin: 2 lines read' in output
+    assert len(_logged()) == 11
+
+    # Unchanged files are skipped, appended data is read on its own
+    output = _run()
+    assert output.count('File unchanged since last read') == 3
+    with open(str(folder / 'c_capture.bin'), 'ab') as w:
+        w.write(_kissframe(payloads[0]))
+    output = _run()
+    assert output.count('File unchanged since last read') == 2
+    assert 'c_capture.bin: 1 lines read' in output
+    assert [record['msgtype'] for record in _logged()[11:]] == [4]
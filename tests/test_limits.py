@@ -0,0 +1,117 @@
+import json
+import os
+
+import pytest
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _beacon(**values):
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    record = next(obj.compileddata for obj in map(swampsat2.ParseDownlink, packets)
+                  if obj.error is None and obj.compileddata['msgtype'] == 4)
+    record.update(values)
+    return record
+
+
+def _alarms(limits, *records):
+    checker = swampsat2.LimitChecker(limits)
+    return [[(event['field'], event['rule'], event['level'], event['value'], event['limit']) for event in checker.check(record)]
+            for record in records]
+
+
+def test_range():
+    limits = {'battery_voltage': {'red': [6.0, 8.6], 'yellow': [7.0, 8.4]}}
+    assert _alarms(limits, _beacon(battery_voltage=7.5), _beacon(battery_voltage=8.5), _beacon(battery_voltage=9.2),
+                   _beacon(battery_voltage=6.5), _beacon(battery_voltage=5.0)) == [
+        [],
+        [('battery_voltage', 'range', 'yellow', 8.5, [7.0, 8.4])],
+        [('battery_voltage', 'range', 'red', 9.2, [6.0, 8.6])],
+        [('battery_voltage', 'range', 'yellow', 6.5, [7.0, 8.4])],
+        [('battery_voltage', 'range', 'red', 5.0, [6.0, 8.6])],
+    ]
+
+
+def test_open_bounds_are_null():
+    limits = {'battery_voltage': {'red': [None, 8.6]}, 'eps_temperature_motherboard': {'yellow': [0, None]}}
+    record = _beacon(battery_voltage=9.0, eps_temperature_motherboard=-5)
+    events = swampsat2.LimitChecker(limits).check(record)
+    assert json.loads(json.dumps(events)) == [
+        {'field': 'battery_voltage', 'rule': 'range', 'level': 'red', 'value': 9.0, 'limit': [None, 8.6]},
+        {'field': 'eps_temperature_motherboard', 'rule': 'range', 'level': 'yellow', 'value': -5, 'limit': [0, None]},
+    ]
+
+
+def test_delta():
+    limits = {'stx_buffer_overrun': {'delta': {'red': 50, 'yellow': 0}}, 'battery_voltage': {'delta': 0.5}}
+    assert _alarms(limits, _beacon(stx_buffer_overrun=10, battery_voltage=7.0), _beacon(stx_buffer_overrun=10, battery_voltage=7.2),
+                   _beacon(stx_buffer_overrun=20, battery_voltage=7.9), _beacon(stx_buffer_overrun=80, battery_voltage=7.9)) == [
+        [],
+        [],
+        [('stx_buffer_overrun', 'delta', 'yellow', 10, 0), ('battery_voltage', 'delta', 'red', pytest.approx(0.7), 0.5)],
+        [('stx_buffer_overrun', 'delta', 'red', 60, 50)],
+    ]
+
+
+def test_flag():
+    limits = {'ants_status_deploymentflag_1': {'expect': 1}, 'ants_status_armed': {'expect': 0, 'level': 'yellow'}}
+    assert _alarms(limits, _beacon(ants_status_deploymentflag_1=1, ants_status_armed=0),
+                   _beacon(ants_status_deploymentflag_1=0, ants_status_armed=1)) == [
+        [],
+        [('ants_status_deploymentflag_1', 'flag', 'red', 0, 1), ('ants_status_armed', 'flag', 'yellow', 1, 0)],
+    ]
+
+
+def test_patterns():
+
+    # A pattern applies to every matching field, a later specific entry overrides it
+    limits = {'ants_status_deploymentflag_*': {'expect': 1}, 'ants_status_deploymentflag_2': {'expect': 0}}
+    record = _beacon(**{'ants_status_deploymentflag_%d' % i: 0 for i in range(1, 5)})
+    assert sorted(field for field, _, _, _, _ in _alarms(limits, record)[0]) == [
+        'ants_status_deploymentflag_1', 'ants_status_deploymentflag_3', 'ants_status_deploymentflag_4']
+
+
+def test_decoder_alarms():
+    checker = swampsat2.LimitChecker({'battery_voltage': {'red': [0, 1]}})
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    records = [obj.compileddata for obj in (swampsat2.ParseDownlink(packet, limits=checker) for packet in packets) if obj.error is None]
+    assert all(len(record['alarms']) == 1 for record in records if record['msgtype'] in (3, 4))
+    assert all(record['alarms'] == [] for record in records if record['msgtype'] == 0)
+
+
+@pytest.mark.parametrize('limits, message', [
+    ([], 'must be an object'),
+    ({'battery_voltage': []}, 'non-empty object'),
+    ({'battery_voltage': {}}, 'non-empty object'),
+    ({'battery_voltage': {'red': [0, 1], 'max': 2}}, 'Unknown limit rule'),
+    ({'battery_voltage': {'level': 'red'}}, 'No red, yellow, delta or expect rule'),
+    ({'battery_voltage': {'red': 5}}, 'must be [LOW, HIGH]'),
+    ({'battery_voltage': {'red': [1, 'x']}}, 'must be [LOW, HIGH]'),
+    ({'battery_voltage': {'yellow': [1, 2, 3]}}, 'must be [LOW, HIGH]'),
+    ({'battery_voltage': {'red': [True, 2]}}, 'must be [LOW, HIGH]'),
+    ({'battery_voltage': {'red': [4, 3]}}, 'LOW above HIGH'),
+    ({'battery_voltage': {'yellow': [1, 2], 'red': [3, 4]}}, 'must be inside "red"'),
+    ({'battery_voltage': {'yellow': [None, 5], 'red': [0, 4]}}, 'must be inside "red"'),
+    ({'battery_voltage': {'delta': -1}}, 'non-negative number'),
+    ({'battery_voltage': {'delta': '1'}}, 'non-negative number'),
+    ({'battery_voltage': {'delta': {}}}, '{"red": MAX, "yellow": MAX}'),
+    ({'battery_voltage': {'delta': {'red': 1, 'orange': 2}}}, '{"red": MAX, "yellow": MAX}'),
+    ({'battery_voltage': {'delta': {'red': -1}}}, '{"red": MAX, "yellow": MAX}'),
+    ({'battery_voltage': {'delta': {'red': 1, 'yellow': 2}}}, 'yellow limit above the red limit'),
+    ({'ants_status_armed': {'expect': 2}}, 'must be 0 or 1'),
+    ({'ants_status_armed': {'expect': 1, 'level': 'orange'}}, 'must be "red" or "yellow"'),
+    ({'battery_voltage': {'red': [0, 1], 'level': 'yellow'}}, 'only applies to an "expect" rule'),
+    ({'battery_volt': {'red': [0, 1]}}, 'does not match any beacon field'),
+])
+def test_validation(limits, message):
+    with pytest.raises(ValueError) as excinfo:
+        swampsat2.LimitChecker(limits)
+    assert message in str(excinfo.value)
+
+
+def test_load(tmp_path):
+    path = tmp_path / 'limits.json'
+    path.write_text(json.dumps({'battery_voltage': {'red': [0, 1]}}))
+    assert len(swampsat2.LimitChecker.load(str(path)).check(_beacon(battery_voltage=2))) == 1
@@ -0,0 +1,35 @@
+import json
+
+import swampsat2
+
+
+def _write(path, records):
+    with open(path, 'at', encoding='utf-8') as w:
+        for record in records:
+            json.dump(record, w, indent=4)
+            w.write('\n')
+
+
+def _records(n, start=0):
+    return [{'timestamp': '2020-02-04 01:%02d:%02d UTC' % divmod(i, 60), 'msgtype': 3 + i % 2} for i in range(start, start + n)]
+
+
+def test_range_queries_follow_appends(tmp_path):
+    path = str(tmp_path / 'log.json')
+    _write(path, _records(100))
+    reader = swampsat2.LogReader(path)
+    assert list(reader.records('2020-02-04 01:00:10', '2020-02-04 01:00:19')) == _records(10, 10)
+
+    # Appended records are indexed by refresh() and by a new reader using the sidecar index
+    _write(path, _records(50, 100))
+    reader.refresh()
+    assert len(reader) == 150
+    assert list(reader.records('2020-02-04 01:02:20', None, 4)) == [r for r in _records(10, 140) if r['msgtype'] == 4]
+    assert list(swampsat2.LogReader(path).records('2020-02-04 01:02:25')) == _records(5, 145)
+
+
+def test_out_of_order_log(tmp_path):
+    path = str(tmp_path / 'log.json')
+    _write(path, _records(10, 20) + _records(10))
+    reader = swampsat2.LogReader(path)
+    assert list(reader.records('2020-02-04 01:00:05', '2020-02-04 01:00:24')) == _records(5, 20) + _records(5, 5)
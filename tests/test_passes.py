@@ -0,0 +1,20 @@
+import time
+
+import swampsat2
+
+
+def _records():
+    records = []
+    seconds = 1580778000
+    for i in range(600):
+        seconds += 900 if i % 50 == 0 else 10
+        records.append({'timestamp': time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(seconds)), 'msgtype': 4,
+                        'battery_voltage': 7 + i % 5 / 10, 'eps_reset_brownout': i // 100, 'eps_bcr1_voltage': 1.0})
+    return records
+
+
+def test_workers_match_in_process():
+    expected = list(swampsat2.summarizepasses(_records(), 600, 1))
+    assert len(expected) == 12
+    assert expected[0]['beacons'] == 50 and expected[0]['battery_voltage_max'] == 7.4
+    assert list(swampsat2.summarizepasses(_records(), 600, 2, batchsize=64)) == expected
@@ -0,0 +1,99 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def server():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    thread = threading.Thread(target=swampsat2.serve, args=('127.0.0.1', port, 2, None, 5), daemon=True)
+    thread.start()
+    for _ in range(100):
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.1).close()
+            break
+        except OSError:
+            time.sleep(0.02)
+    return port
+
+
+def _post(port, path, body):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('POST', path, body)
+    response = conn.getresponse()
+    result = response.status, json.loads(response.read())
+    conn.close()
+    return result
+
+
+def test_decode(server):
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    beacon = [packet for packet in packets if swampsat2.ParseDownlink(packet).error is None][-1]
+    status, payload = _post(server, '/decode', beacon)
+    assert status == 200 and payload['msgtype'] in (0, 3, 4)
+    assert _post(server, '/decode', '0102')[0] == 422
+
+    status, payload = _post(server, '/decode/batch', json.dumps([beacon, 'zz']))
+    assert status == 200 and payload[1]['error'] == 'invalidchar'
+
+
+def test_bad_batch(server):
+    assert _post(server, '/decode/batch', '[1, 2]')[0] == 400
+    assert _post(server, '/decode/batch', '[not json')[0] == 400
+
+
+def test_decoder_exceptions(server, monkeypatch):
+    def _fail(self, hexstr, dlim='', cache=None):
+        raise ValueError('invalid literal')
+    monkeypatch.setattr(swampsat2.ParseDownlink, '_parse', _fail)
+    assert _post(server, '/decode', '0102') == (422, {'error': 'decodefailed', 'message': 'invalid literal'})
+
+    def _crash(self, hexstr, dlim='', cache=None):
+        raise KeyError('x')
+    monkeypatch.setattr(swampsat2.ParseDownlink, '_parse', _crash)
+    assert _post(server, '/decode', '0102')[0] == 500
+
+
+def test_idle_connections_do_not_block(server):
+    # More idle keep-alive connections than workers
+    idle = [socket.create_connection(('127.0.0.1', server)) for _ in range(4)]
+    try:
+        assert _post(server, '/decode', '0102')[0] == 422
+    finally:
+        for conn in idle:
+            conn.close()
+
+
+def test_raw_batch(server):
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    raws = [obj.raw for obj in map(swampsat2.ParseDownlink, packets) if obj.error is None][:3] + [b'\x01\x02', b'']
+    body = b''.join(len(raw).to_bytes(2, 'big') + raw for raw in raws)
+
+    def _postraw(data):
+        conn = http.client.HTTPConnection('127.0.0.1', server, timeout=5)
+        conn.request('POST', '/decode/batch', data, {'Content-Type': 'application/octet-stream'})
+        response = conn.getresponse()
+        result = response.status, json.loads(response.read())
+        conn.close()
+        return result
+
+    status, payload = _postraw(body)
+    assert status == 200
+    assert [result.get('msgtype') for result in payload[:3]] == [swampsat2.ParseDownlink(raw.hex()).compileddata['msgtype'] for raw in raws[:3]]
+    assert [result.get('error') for result in payload[3:]] == ['length', 'empty']
+    assert _postraw(b'') == (200, [])
+
+    # A frame cut short
+    assert _postraw(body + b'\x00\x05\x01')[0] == 400
+    assert _postraw(b'\x00')[0] == 400
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+
+import swampsat2
+
+SAMPLES = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _records():
+    packets = swampsat2._readputtylog(os.path.join(SAMPLES, 'sample_ss2_beacon_txt_log_file.txt'))[0]
+    decoded = [obj.compileddata for obj in map(swampsat2.ParseDownlink, packets + ['0' * 326]) if obj.error is None]
+    return {msgtype: next(record for record in decoded if record['msgtype'] == msgtype) for msgtype in (0, 3, 4)}
+
+
+def test_tables(tmp_path):
+    path = str(tmp_path / 'beacons.db')
+    records = _records()
+
+    # Two runs on the same database, each over several batches
+    for run in range(2):
+        with swampsat2.SqliteSink(path, batchsize=4) as sink:
+            for i in range(10):
+                for msgtype in (0, 3, 4):
+                    record = dict(records[msgtype], timestamp='2020-02-04 01:%02d:%02d UTC' % (run * 10 + i, msgtype))
+                    if msgtype == 4 and i == 0:
+                        record['station'] = 'gainesville'
+                        record['alarms'] = [{'field': 'battery_voltage', 'rule': 'range', 'level': 'red', 'value': 9.2, 'limit': [6.0, 8.6]}]
+                    sink.write(record)
+
+    conn = sqlite3.connect(path)
+    for table in ('acknowledgement', 'beacon3', 'beacon4'):
+        assert conn.execute('SELECT COUNT(*) FROM %s' % table).fetchone() == (20,)
+
+    # Typed columns hold the decoded values
+    types = {name: ftype for _, name, ftype, _, _, _ in conn.execute('PRAGMA table_info(beacon4)')}
+    assert types['id'] == 'INTEGER' and types['timestamp'] == 'TEXT' and types['msgtype'] == 'INTEGER'
+    assert types['battery_voltage'] == 'REAL' and types['station'] == 'TEXT' and types['extra'] == 'TEXT'
+    row = conn.execute('SELECT typeof(battery_voltage), typeof(msgtype), battery_voltage FROM beacon4 LIMIT 1').fetchone()
+    assert row == ('real', 'integer', records[4]['battery_voltage'])
+    assert conn.execute('SELECT message FROM acknowledgement LIMIT 1').fetchone() == (records[0]['message'],)
+
+    # Fields without a column of their own are kept as JSON
+    rows = conn.execute("SELECT station, extra FROM beacon4 WHERE extra IS NOT NULL ORDER BY id").fetchall()
+    assert [(station, json.loads(extra)) for station, extra in rows] == [
+        ('gainesville', {'alarms': [{'field': 'battery_voltage', 'rule': 'range', 'level': 'red', 'value': 9.2, 'limit': [6.0, 8.6]}]})] * 2
+    assert conn.execute('SELECT COUNT(*) FROM beacon4 WHERE station IS NULL AND extra IS NULL').fetchone() == (18,)
+
+    # Messages of every type in one view
+    rows = conn.execute("SELECT timestamp, msgtype, station FROM messages WHERE timestamp < '2020-02-04 01:01' ORDER BY timestamp").fetchall()
+    assert rows == [('2020-02-04 01:00:00 UTC', 0, None), ('2020-02-04 01:00:03 UTC', 3, None), ('2020-02-04 01:00:04 UTC', 4, 'gainesville')]
+    assert conn.execute('SELECT COUNT(*) FROM messages').fetchone() == (60,)
+
+    # Only the timestamp index of each table
+    indexes = sorted(name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'"))
+    assert indexes == ['acknowledgement_timestamp', 'beacon3_timestamp', 'beacon4_timestamp']
+
+
+def test_old_msgtype_index_dropped(tmp_path):
+    path = str(tmp_path / 'beacons.db')
+    swampsat2.SqliteSink(path).close()
+
+    # Databases written by earlier versions also had a (msgtype, timestamp) index
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE INDEX beacon4_msgtype ON beacon4 (msgtype, timestamp)')
+    conn.commit()
+    conn.close()
+
+    swampsat2.SqliteSink(path).close()
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'beacon4_msgtype'").fetchone() == (0,)
@@ -0,0 +1,36 @@
+import pytest
+
+import swampsat2
+
+
+def test_utc_seconds():
+    assert swampsat2._timestampseconds('2020-02-04 01:00:00 EST') == swampsat2._timestampseconds('2020-02-04 06:00:00 UTC')
+    assert swampsat2._timestampseconds('2020-02-04 08:00:00 +02') == swampsat2._timestampseconds('2020-02-04 06:00:00 UTC')
+    assert swampsat2._timestampseconds('2020-02-04 11:30:00 UTC+05:30') == swampsat2._timestampseconds('2020-02-04 06:00:00 UTC')
+
+
+def test_merge_orders_by_utc():
+    east = [{'timestamp': '2020-02-04 01:00:00 EST'}, {'timestamp': '2020-02-04 03:00:00 EST'}]
+    utc = [{'timestamp': '2020-02-04 05:00:00 UTC'}, {'timestamp': '2020-02-04 07:00:00 UTC'}]
+    merged = [(record['station'], record['timestamp']) for record in swampsat2.mergestreams([('a', east), ('b', utc)])]
+    assert merged == [('b', '2020-02-04 05:00:00 UTC'), ('a', '2020-02-04 01:00:00 EST'),
+                      ('b', '2020-02-04 07:00:00 UTC'), ('a', '2020-02-04 03:00:00 EST')]
+
+
+def test_dst_change_keeps_pass_together():
+    # 01:50 EDT is followed by 01:05 EST, 15 minutes later
+    records = [{'timestamp': '2020-11-01 01:50:00 EDT'}, {'timestamp': '2020-11-01 01:05:00 EST'}]
+    passes = list(swampsat2.segmentpasses(records, 600))
+    assert len(passes) == 2
+    passes = list(swampsat2.segmentpasses(records, 1200))
+    assert len(passes) == 1
+
+
+def test_unknown_zone_is_rejected_when_mixed():
+    with pytest.raises(ValueError):
+        list(swampsat2.mergestreams([('a', [{'timestamp': '2020-02-04 01:00:00 XYZ'}]),
+                                     ('b', [{'timestamp': '2020-02-04 01:00:00 UTC'}])]))
+
+    # A single unknown zone is ordered on its wall clock
+    records = [{'timestamp': '2020-02-04 01:00:00 XYZ'}, {'timestamp': '2020-02-04 02:00:00 XYZ'}]
+    assert len(list(swampsat2.segmentpasses(records, 600))) == 2